@@ -1,238 +1,145 @@
-from flask import Flask, render_template, request, jsonify
-from ortools.sat.python import cp_model
+from flask import Flask, Response, render_template, request, jsonify
+import datetime
 import json
+import math
 import subprocess
 import io
+import os
 import sys
-import math
+import threading
+import time
+
+from batch import LEAGUE_FIELDS, iter_batch
+from feasibility import input_errors
+from jobs import JobQueue, QueueFull
+import league
+from metrics import MetricsRegistry
+from portfolio import portfolio_seeds
+from schedule import EXPORT_FORMATS, Schedule, export
+from schedule_cache import CACHEABLE_STATUSES, ScheduleCache, canonical_request, from_canonical, to_canonical
+import schedule_pool
+from schedule_pool import DIRECT_SOLVE_MODES, SchedulePool, pool_result
+from validation import validate_schedule
 
 app = Flask(__name__)
 
-class SolutionCounter(cp_model.CpSolverSolutionCallback):
-    def __init__(self, limit, game, teams, num_teams, num_weeks):
-        cp_model.CpSolverSolutionCallback.__init__(self)
-        self.__solution_count = 0
-        self.__solution_limit = limit
-        self.__game = game
-        self.__teams = teams
-        self.__num_teams = num_teams
-        self.__num_weeks = num_weeks
-        self.__solutions = []
-
-    def on_solution_callback(self):
-        # Build the schedule from the solution
-        schedule = {}
-        for w in range(self.__num_weeks):
-            schedule[w + 1] = []
-            for i in range(self.__num_teams):
-                for j in range(self.__num_teams):
-                    if i != j and self.Value(self.__game[(w, i, j)]) == 1:
-                        schedule[w + 1].append((self.__teams[i], self.__teams[j]))
-        
-        # Check for rematches within 4 weeks
-        valid_solution = True
-        for team in self.__teams:
-            for opponent in self.__teams:
-                if team != opponent:
-                    # Find all weeks where these teams play
-                    matchup_weeks = []
-                    for w in range(1, self.__num_weeks + 1):
-                        if any((match[0] == team and match[1] == opponent) or 
-                               (match[0] == opponent and match[1] == team) 
-                               for match in schedule[w]):
-                            matchup_weeks.append(w)
-                    
-                    # Check gaps between matchups
-                    if len(matchup_weeks) > 1:
-                        min_gap = min(matchup_weeks[i] - matchup_weeks[i-1] for i in range(1, len(matchup_weeks)))
-                        if min_gap < 5:
-                            valid_solution = False
-                            break
-            if not valid_solution:
-                break
-        
-        if valid_solution:
-            self.__solution_count += 1
-            # Store the solution
-            self.__solutions.append(schedule)
-            if self.__solution_count >= self.__solution_limit:
-                self.StopSearch()
-
-    def solution_count(self):
-        return self.__solution_count
-    
-    def solutions(self):
-        return self.__solutions
+# Solve jobs run in a bounded process pool so long searches don't tie up web workers
+JOB_WORKERS = int(os.environ.get('SCHEDULER_JOB_WORKERS', 2))
+JOB_MAX_PENDING = int(os.environ.get('SCHEDULER_JOB_MAX_PENDING', 8))
+_job_queue = None
+_init_lock = threading.Lock()
 
-def generate_schedule(teams, num_weeks, use_divisions, division_teams=None, fixed_matchups=None):
-    num_teams = len(teams)
-    
-    # Validate inputs
-    if num_teams % 2 != 0:
-        return {
-            'status': 'ERROR',
-            'message': 'Number of teams must be even',
-            'solution_count': 0,
-            'solutions': []
-        }
-    
-    if num_weeks < num_teams - 1:
-        return {
-            'status': 'ERROR',
-            'message': f'Season too short. Need at least {num_teams - 1} weeks for each team to play each other once.',
-            'solution_count': 0,
-            'solutions': []
-        }
-    
-    # Create team indices
-    team_indices = {team: i for i, team in enumerate(teams)}
-    
-    # Set up divisions if used
-    divisions = []
-    if use_divisions and division_teams:
-        for division in division_teams:
-            divisions.append([team_indices[team] for team in division])
-    
-    model = cp_model.CpModel()
-
-    # Create binary variables for each possible game in each week
-    game = {}
-    for w in range(num_weeks):
-        for i in range(num_teams):
-            for j in range(num_teams):
-                if i != j:
-                    game[(w, i, j)] = model.NewBoolVar(f'game_w{w}_{teams[i]}_at_{teams[j]}')
-
-    # (1) Each team plays exactly one game per week
-    for w in range(num_weeks):
-        for t in range(num_teams):
-            model.Add(
-                sum(game[(w, t, j)] for j in range(num_teams) if j != t) +
-                sum(game[(w, i, t)] for i in range(num_teams) if i != t)
-                == 1
-            )
-
-    # (2) Home/away balance
-    # For even-week seasons, each team has equal home and away games
-    # For odd-week seasons, teams have at most 1 difference between home and away games
-    min_home_games = (num_weeks - 1) // 2
-    max_home_games = math.ceil(num_weeks / 2)
-    
-    for t in range(num_teams):
-        home_games = sum(game[(w, i, t)] for w in range(num_weeks) for i in range(num_teams) if i != t)
-        model.Add(home_games >= min_home_games)
-        model.Add(home_games <= max_home_games)
-        
-        away_games = sum(game[(w, t, j)] for w in range(num_weeks) for j in range(num_teams) if j != t)
-        model.Add(away_games >= min_home_games)
-        model.Add(away_games <= max_home_games)
-
-    # (3) No team can have 3+ consecutive home/away games
-    for t in range(num_teams):
-        for w in range(num_weeks - 2):
-            model.Add(
-                sum(game[(w+i, j, t)] for i in range(3) for j in range(num_teams) if j != t) <= 2
-            )
-            model.Add(
-                sum(game[(w+i, t, j)] for i in range(3) for j in range(num_teams) if j != t) <= 2
-            )
-
-    # (4) No team can play the same opponent within 4 weeks
-    for i in range(num_teams):
-        for j in range(num_teams):
-            if i != j:
-                for w in range(num_weeks - 4):
-                    for gap in range(1, 5):
-                        if w + gap < num_weeks:
-                            model.Add(
-                                game[(w, i, j)] + game[(w, j, i)] +
-                                game[(w + gap, i, j)] + game[(w + gap, j, i)] <= 1
-                            )
-    
-    # (5) Add scheduling rules based on divisions and season length
-    if use_divisions and divisions:
-        # With divisions: 
-        # - Teams play all divisional opponents home and away
-        # - Teams play all non-divisional opponents at least once
-        for div in divisions:
-            # Divisional matchups: each pair in the same division plays home and away
-            for idx1 in range(len(div)):
-                for idx2 in range(idx1 + 1, len(div)):
-                    i = div[idx1]
-                    j = div[idx2]
-                    model.Add(sum(game[(w, i, j)] for w in range(num_weeks)) == 1)
-                    model.Add(sum(game[(w, j, i)] for w in range(num_weeks)) == 1)
-        
-        # Inter-divisional matchups
-        for div1_idx in range(len(divisions)):
-            for div2_idx in range(div1_idx + 1, len(divisions)):
-                for i in divisions[div1_idx]:
-                    for j in divisions[div2_idx]:
-                        # Each team plays each team from other divisions at least once
-                        model.Add(sum(game[(w, i, j)] + game[(w, j, i)] for w in range(num_weeks)) >= 1)
-                        
-                        # For 14-week seasons, allow up to 2 games between inter-division teams
-                        if num_weeks >= 14:
-                            model.Add(sum(game[(w, i, j)] + game[(w, j, i)] for w in range(num_weeks)) <= 2)
-                        else:
-                            # For 13-week seasons, exactly 1 game between inter-division teams
-                            model.Add(sum(game[(w, i, j)] + game[(w, j, i)] for w in range(num_weeks)) == 1)
-    else:
-        # Without divisions:
-        # - Each team plays every other team at least once
-        # - If a team plays an opponent twice, it must be home and away
-        for i in range(num_teams):
-            for j in range(num_teams):
-                if i != j:
-                    # Each team plays each other team at least once
-                    model.Add(sum(game[(w, i, j)] + game[(w, j, i)] for w in range(num_weeks)) >= 1)
-                    
-                    # If a team plays an opponent twice, it must be once home and once away
-                    # First, create a variable to track if they play twice
-                    plays_twice = model.NewBoolVar(f'plays_twice_{i}_{j}')
-                    
-                    # Link the plays_twice variable to the condition
-                    model.Add(sum(game[(w, i, j)] + game[(w, j, i)] for w in range(num_weeks)) >= 2).OnlyEnforceIf(plays_twice)
-                    model.Add(sum(game[(w, i, j)] + game[(w, j, i)] for w in range(num_weeks)) <= 1).OnlyEnforceIf(plays_twice.Not())
-                    
-                    # If they play twice, ensure it's once home and once away
-                    model.Add(sum(game[(w, i, j)] for w in range(num_weeks)) == 1).OnlyEnforceIf(plays_twice)
-                    model.Add(sum(game[(w, j, i)] for w in range(num_weeks)) == 1).OnlyEnforceIf(plays_twice)
-                    
-                    # For 14-week seasons, allow up to 2 games between any teams
-                    if num_weeks >= 14:
-                        model.Add(sum(game[(w, i, j)] + game[(w, j, i)] for w in range(num_weeks)) <= 2)
-
-    # (6) Add fixed matchups if provided
-    if fixed_matchups:
-        for matchup in fixed_matchups:
-            week = matchup['week'] - 1  # Convert to 0-indexed
-            team1 = team_indices[matchup['team1']]
-            team2 = team_indices[matchup['team2']]
-            
-            if matchup['direction'] == 'either':
-                # Either team1@team2 or team2@team1
-                model.Add(game[(week, team1, team2)] + game[(week, team2, team1)] == 1)
-            elif matchup['direction'] == 'team1_away':
-                # team1 is away, team2 is home
-                model.Add(game[(week, team1, team2)] == 1)
-            elif matchup['direction'] == 'team2_away':
-                # team2 is away, team1 is home
-                model.Add(game[(week, team2, team1)] == 1)
-
-    # Solve the model
-    solver = cp_model.CpSolver()
-    solver.parameters.max_time_in_seconds = 120.0
-
-    # Find solutions
-    solution_limit = 50
-    solution_counter = SolutionCounter(solution_limit, game, teams, num_teams, num_weeks)
-    status = solver.SearchForAllSolutions(model, solution_counter)
+# Upper bounds for the per-request solver knobs accepted by /generate
+MAX_TIME_LIMIT = 120.0
+MAX_SOLUTIONS = 50
+REPLAN_TIME_LIMIT = 10.0
+MAX_BATCH_LEAGUES = 1000
+
+# Solved requests are cached by a canonical hash so repeated or renamed leagues return instantly
+CACHE_PATH = os.environ.get('SCHEDULER_CACHE_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'schedule_cache.sqlite3'))
+CACHE_MEMORY_ENTRIES = int(os.environ.get('SCHEDULER_CACHE_MEMORY_ENTRIES', 128))
+CACHE_DISK_BYTES = int(os.environ.get('SCHEDULER_CACHE_DISK_BYTES', 64 * 1024 * 1024))
+_schedule_cache = None
 
+# Base schedules per league shape (team count, weeks, division sizes), relabeled onto requests.
+# SCHEDULER_POOL_SHAPES (space-separated 'teams:weeks:sizes', none by default) are precomputed
+# in a low-priority background process, outside the job pool.
+POOL_PATH = os.environ.get('SCHEDULER_POOL_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'schedule_pool.sqlite3'))
+POOL_SHAPES = os.environ.get('SCHEDULER_POOL_SHAPES', '').split()
+POOL_BUILD_SIZE = 20
+POOL_BUILD_TIME_LIMIT = 20.0
+_schedule_pool = None
+
+# Per-process solve metrics, exported at /metrics
+solve_metrics = MetricsRegistry()
+
+def generate_schedule(teams, num_weeks, use_divisions, division_teams=None, fixed_matchups=None,
+                      model_backend='game', **options):
+    # Request-shaped wrapper around league.solve; options are the /generate solver knobs
+    spec = league.LeagueSpec.from_request(teams, num_weeks, use_divisions, division_teams, fixed_matchups)
+    return league.solve(spec, model_backend, **options)
+
+def replan_schedule(teams, num_weeks, use_divisions, division_teams, previous, locked_weeks,
+                    fixed_matchups=None, model_backend='pair', time_limit=10.0, search_log=False):
+    spec = league.LeagueSpec.from_request(teams, num_weeks, use_divisions, division_teams, fixed_matchups)
+    return league.replan(spec, previous, locked_weeks, model_backend, time_limit, search_log)
+
+def get_job_queue():
+    # Created lazily so pool workers importing this module don't start pools of their own
+    global _job_queue
+    with _init_lock:
+        if _job_queue is None:
+            _job_queue = JobQueue(generate_schedule, max_workers=JOB_WORKERS, max_pending=JOB_MAX_PENDING)
+        return _job_queue
+
+def get_schedule_cache():
+    global _schedule_cache
+    with _init_lock:
+        if _schedule_cache is None:
+            _schedule_cache = ScheduleCache(CACHE_PATH, CACHE_MEMORY_ENTRIES, CACHE_DISK_BYTES)
+        return _schedule_cache
+
+def get_schedule_pool():
+    global _schedule_pool
+    with _init_lock:
+        created = _schedule_pool is None
+        if created:
+            _schedule_pool = SchedulePool(POOL_PATH)
+    if created and POOL_SHAPES:
+        schedule_pool.warm(_schedule_pool, POOL_SHAPES, POOL_BUILD_SIZE, POOL_BUILD_TIME_LIMIT)
+    return _schedule_pool
+
+def number_option(data, name, kind, default, low, high=None):
+    # A numeric knob of a request body (int or float `kind`), at least `low` and capped at `high`.
+    # Raises ValueError naming the knob for anything else.
+    value = data.get(name)
+    if value is None:
+        return default
+    if isinstance(value, str):
+        try:
+            value = float(value)
+        except ValueError:
+            pass
+    if isinstance(value, bool) or not isinstance(value, (int, float)) \
+            or (kind is int and value != int(value)) or not math.isfinite(value):
+        raise ValueError(f'{name} must be {"an integer" if kind is int else "a number"}')
+    if value < low:
+        raise ValueError(f'{name} must be at least {low}')
+    return kind(value) if high is None else min(kind(value), high)
+
+def request_options(data):
+    # The /generate solver knobs of a request body, with defaults and upper bounds applied.
+    # Raises ValueError for knobs of the wrong type or out of range.
+    solve_mode = data.get('solve_mode', 'enumerate')
+    if solve_mode not in league.SOLVE_MODES:
+        raise ValueError(f"Unknown solve mode: {solve_mode} (choose from {', '.join(league.SOLVE_MODES)})")
+    message = None
+    if solve_mode == 'optimize':
+        _, message = league.objective_stages(data.get('objective'), bool(data.get('lexicographic', False)))
+    elif solve_mode == 'relax':
+        _, message = league.relax_penalties(data.get('penalties'))
+    if not message and data.get('seeds') is not None:
+        _, message = portfolio_seeds(data['seeds'], None)
+    if message:
+        raise ValueError(message)
+    time_limit = league.RELAX_TIME_LIMIT if solve_mode == 'relax' else MAX_TIME_LIMIT
+    cpu_count = os.cpu_count() or 1
     return {
-        'status': solver.StatusName(status),
-        'solution_count': solution_counter.solution_count(),
-        'solutions': solution_counter.solutions()
+        'model_backend': data.get('model_backend', 'game'),
+        'solve_mode': solve_mode,
+        'num_solutions': number_option(data, 'num_solutions', int, MAX_SOLUTIONS, 1, MAX_SOLUTIONS),
+        'time_limit': number_option(data, 'time_limit', float, time_limit, 0.1, MAX_TIME_LIMIT),
+        # Left unset by default so that each solve mode picks its own worker count
+        'num_workers': number_option(data, 'num_workers', int, None, 1, cpu_count),
+        'seeds': data.get('seeds'),
+        'symmetry_breaking': bool(data.get('symmetry_breaking', False)),
+        'explain_infeasible': bool(data.get('explain_infeasible', False)),
+        'objective': data.get('objective'),
+        'lexicographic': bool(data.get('lexicographic', False)),
+        'min_distance': number_option(data, 'min_distance', int, None, 1),
+        'penalties': data.get('penalties'),
+        'search_log': bool(data.get('search_log', False)),
+        'distinct_count': bool(data.get('distinct_count', False)),
     }
 
 @app.route('/')
@@ -243,13 +150,250 @@ def index():
 def generate():
     data = request.json
     teams = data['teams']
-    num_weeks = int(data['num_weeks'])
     use_divisions = data['use_divisions']
     division_teams = data.get('division_teams', None)
     fixed_matchups = data.get('fixed_matchups', [])
+    try:
+        num_weeks = number_option(data, 'num_weeks', int, None, 1)
+        if num_weeks is None:
+            raise ValueError('num_weeks is required')
+        options = request_options(data)
+    except (TypeError, ValueError) as e:
+        return jsonify(league.error_result(str(e))), 400
+
+    # Malformed and provably infeasible requests fail here without queueing a solve
+    spec = league.LeagueSpec.from_request(teams, num_weeks, use_divisions, division_teams, fixed_matchups)
+    rejected = league.precheck(spec, options['model_backend'], relax=options['solve_mode'] == 'relax')
+    if rejected is not None:
+        return jsonify(rejected), 400 if rejected['status'] == 'ERROR' else 422
     
-    result = generate_schedule(teams, num_weeks, use_divisions, division_teams, fixed_matchups)
+    cache = get_schedule_cache()
+    try:
+        key, labels = canonical_request(teams, num_weeks, use_divisions, division_teams, fixed_matchups,
+                                        **options)
+    except (KeyError, TypeError):
+        # Malformed requests skip the cache; the solve job reports the error
+        key, labels = None, None
+
+    cached = cache.get(key) if key else None
+    if cached is not None:
+        job = get_job_queue().add_cached(from_canonical(cached, labels), league=spec)
+        return jsonify(job.status())
+
+    # A pool schedule relabeled to play every fixed matchup answers a plain listing without
+    # solving; otherwise the closest pool schedule seeds the solver
+    pool = get_schedule_pool()
+    match_start = time.perf_counter()
+    fitting, hint = pool.match(spec, options['num_solutions'])
+    if fitting and options['solve_mode'] in DIRECT_SOLVE_MODES and not options['symmetry_breaking']:
+        result = pool_result(spec, fitting, time.perf_counter() - match_start, options['distinct_count'])
+        solve_metrics.record_solve(result)
+        job = get_job_queue().add_cached(result, league=spec)
+        return jsonify(job.status())
+    warm_start = fitting[0] if fitting else hint
+    if warm_start is not None:
+        options['warm_start'] = warm_start.matrices()
+
+    def finished(result):
+        solve_metrics.record_solve(result)
+        # Relaxed schedules that break rules are not valid base schedules
+        if result['status'] in ('OPTIMAL', 'FEASIBLE') and not result.get('violations'):
+            pool.add(spec, result['solutions'])
+        # Conflict explanations and violation reports name the request's own teams, so they are
+        # not shared through the cache
+        if key and result['status'] in CACHEABLE_STATUSES and 'conflicts' not in result \
+                and not result.get('violations'):
+            # Timings describe the original solve, not later cache hits
+            cached_result = {k: v for k, v in result.items() if k != 'metrics'}
+            cache.put(key, to_canonical(cached_result, labels))
+
+    try:
+        job = get_job_queue().submit(on_complete=finished, league=spec,
+                                     teams=teams, num_weeks=num_weeks, use_divisions=use_divisions,
+                                     division_teams=division_teams, fixed_matchups=fixed_matchups,
+                                     **options)
+    except QueueFull as e:
+        return jsonify({'status': 'ERROR', 'message': str(e)}), 503
+    return jsonify(job.status()), 202
+
+@app.route('/generate/batch', methods=['POST'])
+def generate_batch():
+    # Many leagues in one call: `leagues` is a list of /generate bodies. The batch is a job whose
+    # solves run on the shared job pool, each with at most `num_workers` search workers (by default
+    # the cores divided among the job workers). Returns the job; GET /generate/batch/<job_id>
+    # streams its results.
+    data = request.json
+    leagues = data['leagues']
+    if len(leagues) > MAX_BATCH_LEAGUES:
+        return jsonify(league.error_result(f'At most {MAX_BATCH_LEAGUES} leagues per batch')), 400
+    worker_share = max(1, (os.cpu_count() or 1) // JOB_WORKERS)
+    try:
+        search_workers = number_option(data, 'num_workers', int, worker_share, 1, worker_share)
+    except ValueError as e:
+        return jsonify(league.error_result(str(e))), 400
+
+    requests, indices, malformed = [], [], []
+    for index, entry in enumerate(leagues):
+        try:
+            requests.append(dict({field: entry.get(field) for field in LEAGUE_FIELDS}, **request_options(entry)))
+            indices.append(index)
+        except (AttributeError, TypeError, ValueError) as e:
+            malformed.append((index, league.error_result(f'Malformed league: {e}')))
+    cache, pool, jobs = get_schedule_cache(), get_schedule_pool(), get_job_queue()
+
+    def run(emit, cancel_event):
+        sources = {}
+        for index, result in malformed:
+            sources['rejected'] = sources.get('rejected', 0) + 1
+            emit({'index': index, 'source': 'rejected', 'result': result})
+        for position, result, source in iter_batch(requests, generate_schedule, search_workers, cache, pool,
+                                                   jobs.submit_task):
+            if source == 'solve':
+                solve_metrics.record_solve(result)
+            sources[source] = sources.get(source, 0) + 1
+            emit({'index': indices[position], 'source': source, 'result': result})
+            if cancel_event.is_set():
+                break
+        return {'status': 'DONE', 'leagues': len(leagues), 'sources': sources}
+
+    try:
+        job = jobs.submit_local(run)
+    except QueueFull as e:
+        return jsonify({'status': 'ERROR', 'message': str(e)}), 503
+    return jsonify(job.status()), 202
+
+@app.route('/generate/batch/<job_id>')
+def batch_results(job_id):
+    # Newline-delimited JSON: one line per league as it finishes (in completion order, with its
+    # `index`), then a summary line
+    job, error = _get_job_or_404(job_id)
+    if error:
+        return error
+
+    def stream():
+        for entry in job.iter_solutions():
+            yield json.dumps(dict(entry, type='result')) + '\n'
+        status = job.status()
+        yield json.dumps({'type': 'summary', 'state': status['state'], 'leagues': status.get('leagues'),
+                          'sources': status.get('sources', {})}) + '\n'
+
+    return Response(stream(), mimetype='application/x-ndjson')
+
+@app.route('/replan', methods=['POST'])
+def replan():
+    data = request.json
+    try:
+        num_weeks = number_option(data, 'num_weeks', int, None, 1)
+        if num_weeks is None:
+            raise ValueError('num_weeks is required')
+        time_limit = number_option(data, 'time_limit', float, REPLAN_TIME_LIMIT, 0.1, REPLAN_TIME_LIMIT)
+        if 'previous' not in data:
+            raise ValueError('previous is required')
+    except ValueError as e:
+        return jsonify(league.error_result(str(e))), 400
+    result = replan_schedule(
+        data['teams'], num_weeks, data['use_divisions'], data.get('division_teams'),
+        data['previous'], data.get('locked_weeks', []),
+        fixed_matchups=data.get('fixed_matchups', []),
+        model_backend=data.get('model_backend', 'pair'),
+        time_limit=time_limit, search_log=bool(data.get('search_log', False)))
+    if result['status'] == 'ERROR':
+        return jsonify(result), 400
+    solve_metrics.record_solve(result)
     return jsonify(result)
 
+@app.route('/validate', methods=['POST'])
+def validate():
+    # Rule check of an uploaded or edited schedule (`schedule`), or of a list (`schedules`)
+    data = request.json
+    spec = league.LeagueSpec.from_request(data['teams'], int(data['num_weeks']), data['use_divisions'],
+                                          data.get('division_teams'), data.get('fixed_matchups', []))
+    errors = input_errors(spec.teams, spec.num_weeks, bool(spec.divisions), spec.divisions, spec.fixed_matchups)
+    if errors:
+        return jsonify(league.error_result('; '.join(errors))), 400
+    try:
+        if 'schedules' in data:
+            results = [validate_schedule(spec, schedule) for schedule in data['schedules']]
+            return jsonify({'valid_count': sum(result['valid'] for result in results), 'results': results})
+        return jsonify(validate_schedule(spec, data['schedule']))
+    except ValueError as e:
+        return jsonify(league.error_result(str(e))), 400
+
+@app.route('/metrics')
+def metrics_endpoint():
+    # Prometheus text exposition of solve metrics, cache lookups and job states
+    cache = get_schedule_cache().stats()
+    gauges = [
+        ('scheduler_cache_lookups_total', {'result': 'memory_hit'}, cache['memory_hits']),
+        ('scheduler_cache_lookups_total', {'result': 'disk_hit'}, cache['disk_hits']),
+        ('scheduler_cache_lookups_total', {'result': 'miss'}, cache['misses']),
+    ]
+    for state, count in get_job_queue().counts().items():
+        gauges.append(('scheduler_jobs', {'state': state}, count))
+    return Response(solve_metrics.render(gauges), mimetype='text/plain; version=0.0.4')
+
+@app.route('/cache/stats')
+def cache_stats():
+    return jsonify(get_schedule_cache().stats())
+
+def _get_job_or_404(job_id):
+    job = get_job_queue().get(job_id)
+    if job is None:
+        return None, (jsonify({'status': 'ERROR', 'message': f'Unknown job: {job_id}'}), 404)
+    return job, None
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    job, error = _get_job_or_404(job_id)
+    if error:
+        return error
+    return jsonify(job.status())
+
+@app.route('/jobs/<job_id>', methods=['DELETE'])
+def cancel_job(job_id):
+    job, error = _get_job_or_404(job_id)
+    if error:
+        return error
+    job.cancel()
+    return jsonify(job.status())
+
+@app.route('/jobs/<job_id>/solutions')
+def job_solutions(job_id):
+    # Newline-delimited JSON: one line per schedule as the solver finds it, then a final status line
+    job, error = _get_job_or_404(job_id)
+    if error:
+        return error
+
+    def stream():
+        for index, schedule in enumerate(job.iter_solutions()):
+            yield json.dumps({'type': 'solution', 'index': index, 'schedule': schedule}) + '\n'
+        yield json.dumps(dict(job.status(), type='status')) + '\n'
+
+    return Response(stream(), mimetype='application/x-ndjson')
+
+@app.route('/jobs/<job_id>/export')
+def export_job(job_id):
+    # The job's schedules as csv, ics (first schedule, weekly from season_start), ndjson or bin;
+    # waits for a running job to finish
+    job, error = _get_job_or_404(job_id)
+    if error:
+        return error
+    fmt = request.args.get('format', 'csv')
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({'status': 'ERROR', 'message': f"Unknown export format: {fmt}"}), 400
+    try:
+        season_start = datetime.date.fromisoformat(request.args['season_start']) if 'season_start' in request.args else None
+    except ValueError:
+        return jsonify({'status': 'ERROR', 'message': 'season_start must be a YYYY-MM-DD date'}), 400
+
+    spec = job.league
+    if spec is None:
+        return jsonify({'status': 'ERROR', 'message': f'Job {job.id} has no schedules to export'}), 400
+    schedules = [Schedule.from_dict(schedule, spec.teams, spec.num_weeks) for schedule in job.iter_solutions()]
+    output = io.BytesIO() if fmt == 'bin' else io.StringIO(newline='')
+    export(schedules, fmt, output, season_start)
+    return Response(output.getvalue(), mimetype=EXPORT_FORMATS[fmt],
+                    headers={'Content-Disposition': f'attachment; filename=schedules-{job.id}.{fmt}'})
+
 if __name__ == '__main__':
     app.run(debug=True) 
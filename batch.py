@@ -0,0 +1,158 @@
+"""Solve many leagues in one run and write one NDJSON line per league as each finishes.
+
+Leagues that are the same up to team names (and ordering) are solved once and relabeled.
+With a cache or pool (as in the web app), cached results and pool schedules are used first.
+The remaining solves share a process pool sized to a global CPU budget, or in the web app the
+job pool that /generate uses.
+
+Usage: python batch.py leagues.json [--cpus 4] [--time-limit 30] [--solutions 10] [--out results.ndjson]
+where leagues.json is a list of /generate request bodies (or {"leagues": [...]}).
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import league
+from schedule_cache import CACHEABLE_STATUSES, canonical_request, from_canonical, to_canonical
+from schedule_pool import DIRECT_SOLVE_MODES, pool_result
+
+# Request fields that describe the league; everything else in a batch entry is a solve option
+LEAGUE_FIELDS = ('teams', 'num_weeks', 'use_divisions', 'division_teams', 'fixed_matchups')
+
+
+def _solve_league(solve, kwargs):
+    # Runs in a pool worker
+    return solve(**kwargs)
+
+
+def _spec(kwargs):
+    return league.LeagueSpec.from_request(kwargs['teams'], kwargs['num_weeks'], kwargs['use_divisions'],
+                                          kwargs.get('division_teams'), kwargs.get('fixed_matchups'))
+
+
+def iter_batch(leagues, solve, cpu_budget, cache=None, pool=None, submit=None):
+    # leagues: keyword arguments for solve (LEAGUE_FIELDS plus options), one dict per league.
+    # Yields (index, result, source) in completion order; source is 'rejected', 'cache', 'pool',
+    # 'solve', or 'duplicate' for a league relabeled from an identical one. Solves run on a
+    # process pool of cpu_budget cores created for the batch, or with submit(fn, *args) -> Future
+    # (a shared pool) each with cpu_budget search workers.
+    groups = {}
+    for index, kwargs in enumerate(leagues):
+        try:
+            spec = _spec(kwargs)
+        except (KeyError, TypeError, ValueError) as e:
+            yield index, league.error_result(f'Malformed league: {e}'), 'rejected'
+            continue
+        rejected = league.precheck(spec, kwargs.get('model_backend', 'game'),
+                                   relax=kwargs.get('solve_mode') == 'relax')
+        if rejected is not None:
+            yield index, rejected, 'rejected'
+            continue
+        try:
+            key, labels = canonical_request(**kwargs)
+        except (KeyError, TypeError):
+            key, labels = f'league-{index}', None
+        groups.setdefault(key, []).append((index, labels, spec, kwargs))
+
+    def answer(key, result, source):
+        # The result for every league of a group, relabeled from the group's first league
+        (first, first_labels, _, _), *rest = groups[key]
+        yield first, result, source
+        # Conflict explanations and violation reports name the first league's teams, so they are not relabeled
+        canonical = to_canonical({k: v for k, v in result.items() if k not in ('conflicts', 'violations')},
+                                 first_labels) if rest else None
+        for index, labels, _, _ in rest:
+            yield index, from_canonical(canonical, labels), 'duplicate'
+
+    to_solve = []
+    for key, members in groups.items():
+        _, labels, spec, kwargs = members[0]
+        cached = cache.get(key) if cache is not None and labels is not None else None
+        if cached is not None:
+            yield from answer(key, from_canonical(cached, labels), 'cache')
+            continue
+        if pool is not None:
+            fitting, hint = pool.match(spec, kwargs.get('num_solutions', 50))
+            if fitting and kwargs.get('solve_mode', 'enumerate') in DIRECT_SOLVE_MODES \
+                    and not kwargs.get('symmetry_breaking'):
+                yield from answer(key, pool_result(spec, fitting, 0.0, kwargs.get('distinct_count', False)), 'pool')
+                continue
+            warm_start = fitting[0] if fitting else hint
+            if warm_start is not None:
+                kwargs = dict(kwargs, warm_start=warm_start.matrices())
+        to_solve.append((key, kwargs))
+    if not to_solve:
+        return
+
+    executor = None
+    if submit is None:
+        # Split the CPU budget between concurrent solves, as in portfolio mode
+        processes = max(1, min(cpu_budget, len(to_solve)))
+        search_workers = max(1, cpu_budget // processes)
+        executor = ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context('spawn'))
+        submit = executor.submit
+    else:
+        search_workers = cpu_budget
+    futures = {}
+    try:
+        for key, kwargs in to_solve:
+            futures[submit(_solve_league, solve, dict(kwargs, num_workers=search_workers))] = key
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                key = futures[future]
+                _, labels, spec, _ = groups[key][0]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = league.error_result(f'Solve failed: {e}')
+                if cache is not None and labels is not None and result['status'] in CACHEABLE_STATUSES \
+                        and 'conflicts' not in result and not result.get('violations'):
+                    cache.put(key, to_canonical({k: v for k, v in result.items() if k != 'metrics'}, labels))
+                if pool is not None and result['status'] in ('OPTIMAL', 'FEASIBLE') and not result.get('violations'):
+                    pool.add(spec, result['solutions'])
+                yield from answer(key, result, 'solve')
+    finally:
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+        else:
+            # Stopped early: solves that have not started leave the shared pool
+            for future in futures:
+                future.cancel()
+
+
+def main(argv=None):
+    from app import generate_schedule
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('leagues', help='JSON file with a list of leagues')
+    parser.add_argument('--cpus', type=int, default=os.cpu_count() or 1, help='CPU cores shared by all solves')
+    parser.add_argument('--time-limit', type=float, default=30.0, help='default solve budget per league in seconds')
+    parser.add_argument('--solutions', type=int, default=10, help='default schedules per league')
+    parser.add_argument('--out', help='NDJSON output path (default: stdout)')
+    args = parser.parse_args(argv)
+
+    with open(args.leagues) as f:
+        leagues = json.load(f)
+    if isinstance(leagues, dict):
+        leagues = leagues['leagues']
+    leagues = [dict({'time_limit': args.time_limit, 'num_solutions': args.solutions}, **entry) for entry in leagues]
+
+    out = open(args.out, 'w') if args.out else sys.stdout
+    try:
+        for index, result, source in iter_batch(leagues, generate_schedule, args.cpus):
+            out.write(json.dumps({'index': index, 'source': source, 'result': result}) + '\n')
+            out.flush()
+            print(f"league {index}: {result['status']} ({source}, {result['solution_count']} schedules)",
+                  file=sys.stderr)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+
+if __name__ == '__main__':
+    main()
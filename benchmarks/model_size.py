@@ -0,0 +1,69 @@
+"""Compare model size and time-to-first-solution of the generate_schedule backends.
+
+Usage: python benchmarks/model_size.py [--teams 10 12 16 20] [--time-limit 60]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ortools.sat.python import cp_model
+
+from league import MODEL_BACKENDS, LeagueSpec, build_model
+
+
+def league(num_teams):
+    # Two equal divisions; enough weeks for a divisional double round-robin
+    # plus one game against every inter-division opponent.
+    teams = [f'T{t}' for t in range(num_teams)]
+    half = num_teams // 2
+    num_weeks = 2 * (half - 1) + half + 1
+    return LeagueSpec(teams, num_weeks, [teams[:half], teams[half:]])
+
+
+def run(backend, num_teams, time_limit):
+    spec = league(num_teams)
+
+    start = time.perf_counter()
+    model, _ = build_model(spec, backend)
+    build_s = time.perf_counter() - start
+
+    proto = model.Proto()
+    solver = cp_model.CpSolver()
+    solver.parameters.max_time_in_seconds = time_limit
+    solver.parameters.stop_after_first_solution = True
+    status = solver.Solve(model)
+
+    return {
+        'backend': backend,
+        'teams': num_teams,
+        'weeks': spec.num_weeks,
+        'variables': len(proto.variables),
+        'constraints': len(proto.constraints),
+        'build_s': build_s,
+        'first_solution_s': solver.WallTime(),
+        'status': solver.StatusName(status),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--teams', type=int, nargs='+', default=[10, 12, 16, 20])
+    parser.add_argument('--backends', nargs='+', default=list(MODEL_BACKENDS))
+    parser.add_argument('--time-limit', type=float, default=60.0)
+    args = parser.parse_args()
+
+    header = f"{'backend':<8}{'teams':>6}{'weeks':>6}{'vars':>9}{'constraints':>13}{'build s':>10}{'first sol s':>13}  status"
+    print(header)
+    print('-' * len(header))
+    for num_teams in args.teams:
+        for backend in args.backends:
+            r = run(backend, num_teams, args.time_limit)
+            print(f"{r['backend']:<8}{r['teams']:>6}{r['weeks']:>6}{r['variables']:>9}{r['constraints']:>13}"
+                  f"{r['build_s']:>10.3f}{r['first_solution_s']:>13.3f}  {r['status']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,233 @@
+"""Benchmark generate_schedule over league sizes, season lengths and constraint mixes.
+
+Every case runs in a fresh process so peak RSS is per case. Results are written as JSON and
+CSV with a stable case order, so reports from two commits can be diffed or compared with
+--baseline.
+
+Usage: python benchmarks/suite.py [--teams 6 8 10] [--time-limit 20] [--out benchmarks/results]
+       python benchmarks/suite.py --teams 20 24 30 40 --solve-modes decompose   (large leagues)
+       python benchmarks/suite.py --baseline old.json   (print timing changes against an earlier report)
+"""
+import argparse
+import contextlib
+import csv
+import io
+import json
+import multiprocessing
+import os
+import platform
+import re
+import resource
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+FIELDS = ['case', 'target', 'solve_mode', 'backend', 'teams', 'weeks', 'divisions', 'fixed_matchups', 'status',
+          'variables', 'constraints', 'model_build_ms', 'time_to_first_solution_ms', 'solve_ms',
+          'solutions', 'wall_ms', 'peak_rss_mb']
+
+
+def season_lengths(num_teams, steps):
+    # `steps` season lengths spread evenly from a single round-robin (n - 1) to a double one
+    low, high = num_teams - 1, 2 * (num_teams - 1)
+    if steps == 1:
+        return [low]
+    return sorted({round(low + (high - low) * k / (steps - 1)) for k in range(steps)})
+
+
+def league(num_teams, num_weeks, use_divisions, num_fixed):
+    teams = [f'T{t}' for t in range(num_teams)]
+    half = num_teams // 2
+    division_teams = [teams[:half], teams[half:]] if use_divisions else None
+    # Team 0 meets a different opponent in each of the first weeks, which any round-robin allows
+    fixed_matchups = [{'team1': teams[0], 'team2': teams[k + 1], 'week': k + 1, 'direction': 'either'}
+                      for k in range(num_fixed)]
+    return {'teams': teams, 'num_weeks': num_weeks, 'use_divisions': use_divisions,
+            'division_teams': division_teams, 'fixed_matchups': fixed_matchups}
+
+
+def cases(args):
+    for num_teams in args.teams:
+        half = num_teams // 2
+        for num_weeks in season_lengths(num_teams, args.week_steps):
+            for use_divisions in args.divisions:
+                # Divisional double round-robin plus one game against each inter-division opponent
+                if use_divisions and num_weeks < 2 * (half - 1) + half:
+                    continue
+                for num_fixed in args.fixed:
+                    if num_fixed >= min(num_teams, num_weeks + 1):
+                        continue
+                    for solve_mode in args.solve_modes:
+                        # The two-phase solver does not use a model backend
+                        for backend in args.backends if solve_mode != 'decompose' else args.backends[:1]:
+                            if solve_mode == 'enumerate':
+                                prefix = backend
+                            elif solve_mode == 'decompose':
+                                prefix = 'decompose'
+                            else:
+                                prefix = f'{solve_mode}-{backend}'
+                            name = f"{prefix}-t{num_teams}-w{num_weeks}-{'div' if use_divisions else 'nodiv'}-f{num_fixed}"
+                            yield name, solve_mode, backend, league(num_teams, num_weeks, use_divisions, num_fixed)
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def run_case(name, solve_mode, backend, spec, time_limit, num_solutions):
+    # Runs in its own process
+    from app import generate_schedule
+
+    start = time.perf_counter()
+    result = generate_schedule(spec['teams'], spec['num_weeks'], spec['use_divisions'], spec['division_teams'],
+                               spec['fixed_matchups'], model_backend=backend, solve_mode=solve_mode,
+                               num_solutions=num_solutions, time_limit=time_limit)
+    wall_ms = (time.perf_counter() - start) * 1000
+    metrics = result.get('metrics', {})
+    return {
+        'case': name,
+        'target': 'generate_schedule',
+        'solve_mode': solve_mode,
+        'backend': backend,
+        'teams': len(spec['teams']),
+        'weeks': spec['num_weeks'],
+        'divisions': spec['use_divisions'],
+        'fixed_matchups': len(spec['fixed_matchups']),
+        'status': result['status'],
+        'variables': metrics.get('variables'),
+        'constraints': metrics.get('constraints'),
+        'model_build_ms': metrics.get('model_build_ms'),
+        'time_to_first_solution_ms': metrics.get('time_to_first_solution_ms'),
+        'solve_ms': metrics.get('solve_ms'),
+        'solutions': result['solution_count'],
+        'wall_ms': wall_ms,
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+def run_cli():
+    # Runs in its own process: the fixed 10-team league of schedule_csp.main
+    import schedule_csp
+
+    output = io.StringIO()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(output):
+        schedule_csp.main([])
+    wall_ms = (time.perf_counter() - start) * 1000
+    found = re.search(r'Number of valid solutions found: (\d+)', output.getvalue())
+    return {
+        'case': 'cli-schedule_csp',
+        'target': 'schedule_csp.main',
+        'solve_mode': 'enumerate',
+        'backend': 'game',
+        'teams': 10,
+        'weeks': 14,
+        'divisions': True,
+        'fixed_matchups': 5,
+        'status': 'FEASIBLE' if found and int(found.group(1)) else 'UNKNOWN',
+        'solutions': int(found.group(1)) if found else 0,
+        'wall_ms': wall_ms,
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+def in_fresh_process(fn, *args):
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as pool:
+        return pool.submit(fn, *args).result()
+
+
+def environment():
+    from ortools import __version__ as ortools_version
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                                capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'commit': commit,
+        'python': platform.python_version(),
+        'ortools': ortools_version,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+def write_reports(report, out):
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out + '.json', 'w') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+    with open(out + '.csv', 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDS)
+        writer.writeheader()
+        for row in report['results']:
+            writer.writerow({field: row.get(field) for field in FIELDS})
+
+
+def compare(report, baseline_path):
+    with open(baseline_path) as f:
+        baseline = {row['case']: row for row in json.load(f)['results']}
+    print(f"\nvs {baseline_path}:")
+    print(f"{'case':<36}{'first sol ms':>22}{'solutions':>14}{'peak MB':>16}")
+    for row in report['results']:
+        old = baseline.get(row['case'])
+        if old is None:
+            continue
+        first = f"{old.get('time_to_first_solution_ms') or 0:.0f} -> {row.get('time_to_first_solution_ms') or 0:.0f}"
+        solutions = f"{old['solutions']} -> {row['solutions']}"
+        peak = f"{old['peak_rss_mb']:.0f} -> {row['peak_rss_mb']:.0f}"
+        print(f"{row['case']:<36}{first:>22}{solutions:>14}{peak:>16}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--teams', type=int, nargs='+', default=[6, 8, 10, 12, 14, 16, 18, 20, 22, 24])
+    parser.add_argument('--week-steps', type=int, default=3,
+                        help='season lengths per league size, from n-1 to 2(n-1) weeks')
+    parser.add_argument('--divisions', type=lambda s: s == 'yes', nargs='+', default=[False, True],
+                        metavar='{yes,no}')
+    parser.add_argument('--fixed', type=int, nargs='+', default=[0, 3], help='numbers of fixed matchups')
+    parser.add_argument('--backends', nargs='+', default=['pair', 'game'])
+    parser.add_argument('--solve-modes', nargs='+', default=['enumerate'],
+                        help='solve modes to time, e.g. enumerate decompose')
+    parser.add_argument('--time-limit', type=float, default=20.0, help='solve budget per case in seconds')
+    parser.add_argument('--num-solutions', type=int, default=10)
+    parser.add_argument('--cli', action='store_true', help='also time schedule_csp.main')
+    parser.add_argument('--out', default=os.path.join(ROOT, 'benchmarks', 'results', 'latest'),
+                        help='report path without extension; writes .json and .csv')
+    parser.add_argument('--baseline', help='earlier JSON report to compare against')
+    args = parser.parse_args()
+
+    results = []
+    header = f"{'case':<36}{'status':>10}{'build ms':>10}{'first sol ms':>14}{'solutions':>11}{'peak MB':>9}"
+    print(header)
+    print('-' * len(header))
+    runs = [(run_case, name, solve_mode, backend, spec, args.time_limit, args.num_solutions)
+            for name, solve_mode, backend, spec in cases(args)]
+    if args.cli:
+        runs.append((run_cli,))
+    for fn, *fn_args in runs:
+        row = in_fresh_process(fn, *fn_args)
+        results.append(row)
+        first = row.get('time_to_first_solution_ms')
+        print(f"{row['case']:<36}{row['status']:>10}{row.get('model_build_ms') or 0:>10.1f}"
+              f"{first if first is not None else float('nan'):>14.1f}{row['solutions']:>11}{row['peak_rss_mb']:>9.1f}")
+
+    report = {
+        'environment': environment(),
+        'parameters': {'time_limit': args.time_limit, 'num_solutions': args.num_solutions},
+        'results': results,
+    }
+    write_reports(report, args.out)
+    print(f"\nWrote {args.out}.json and {args.out}.csv")
+    if args.baseline:
+        compare(report, args.baseline)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,242 @@
+import time
+
+import numpy as np
+from ortools.sat.python import cp_model
+
+from feasibility import REMATCH_GAP
+from jobs import stop_on_cancel
+
+# Two-phase scheduling for large leagues. Phase 1 (here) decides who plays whom in each week;
+# phase 2 (league.PatternLayout) assigns home and away over that fixed timetable.
+#
+# A timetable is a week x team matrix of opponents. It is built from "rounds" (perfect matchings
+# of the league) taken from circle-method round-robins, so only the order of the rounds is left
+# to the solver: a model with one literal per (week, round) instead of one per (week, pair).
+
+# Each timetable solve stops at the best round order found within this many seconds
+TIMETABLE_TIME_LIMIT = 5.0
+
+
+def circle_rounds(members):
+    # Circle-method single round-robin as a list of rounds, each a list of pairs. An odd number
+    # of members gets len(members) rounds with one member sitting out each round.
+    members = list(members) + ([None] if len(members) % 2 else [])
+    n = len(members)
+    rounds = []
+    for r in range(n - 1):
+        pairs = [(members[r], members[n - 1])]
+        pairs += [(members[(r + k) % (n - 1)], members[(r - k) % (n - 1)]) for k in range(1, n // 2)]
+        rounds.append([pair for pair in pairs if None not in pair])
+    return rounds
+
+
+def inter_rounds(divisions, rotations=None):
+    # Rounds covering the inter-division games of an even number of equal-sized divisions:
+    # divisions are paired by a circle-method round-robin, and each pairing A-B plays the
+    # rotations A[i] - B[(i + r) % len(A)] (all of them unless `rotations` is given)
+    size = len(divisions[0])
+    rounds = []
+    for division_pairs in circle_rounds(range(len(divisions))):
+        for r in rotations or range(size):
+            rounds.append([(divisions[a][i], divisions[b][(i + r) % size])
+                           for a, b in division_pairs for i in range(size)])
+    return rounds
+
+
+def round_blocks(teams, num_weeks, divisions):
+    # The rounds a season is assembled from, as (pairs, fewest uses, most uses), built over the
+    # teams (or each division's teams) in the order given. Every pair of teams is in exactly one
+    # round, so meeting counts and rematch gaps follow from how often and how far apart a round
+    # is played. Returns None when the league has no such pattern (divisions of unequal size,
+    # an odd number of divisions, odd-sized divisions other than two in a 14+ week season, teams
+    # outside any division).
+    if not divisions:
+        return [(pairs, 1, 2) for pairs in circle_rounds(teams)]
+
+    sizes = {len(division) for division in divisions}
+    size = sizes.pop()
+    if sizes or len(divisions) % 2 or size * len(divisions) != len(teams):
+        return None
+    # Inter-division opponents are met once, or up to twice in 14+ week seasons
+    inter_uses = 2 if num_weeks >= 14 else 1
+    # Divisional double round-robin: the same round of every division is played in the same week
+    intra = [[pair for division_round in same_round for pair in division_round]
+             for same_round in zip(*(circle_rounds(division) for division in divisions))]
+    if size % 2 == 0:
+        return [(pairs, 2, 2) for pairs in intra] + [(pairs, 1, inter_uses) for pairs in inter_rounds(divisions)]
+
+    # Odd-sized divisions sit out one team per round. With two divisions the teams sitting out,
+    # A[r] and B[r], play each other, so rotation 0 is played within the divisional rounds (twice)
+    if len(divisions) != 2 or inter_uses < 2:
+        return None
+    a, b = divisions
+    intra = [pairs + [(a[r], b[r])] for r, pairs in enumerate(intra)]
+    return [(pairs, 2, 2) for pairs in intra] + [(pairs, 1, 2) for pairs in inter_rounds(divisions, range(1, size))]
+
+
+def season_order(blocks, num_weeks):
+    # Week-by-week rounds of a mirrored season: the rounds played twice open and close it in the
+    # same order (divisional double round-robin), the rest fill the middle and repeat from the
+    # start for any extra weeks. Home/away assignments over this order are easy to find.
+    twice = [b for b, (_, fewest, _) in enumerate(blocks) if fewest == 2]
+    once = [b for b, (_, fewest, _) in enumerate(blocks) if fewest == 1]
+    return twice + once + once[:num_weeks - 2 * len(twice) - len(once)] + twice
+
+
+def relabel(num_teams, divisions, fixed_pairs):
+    # Team order for round_blocks that puts the busiest week of fixed matchups into one round:
+    # the first circle round without divisions; with divisions, the first divisional round or the
+    # first rotation A[i] - B[i]. Returns (teams, divisions) reordered.
+    by_week = {}
+    for week, i, j in fixed_pairs:
+        by_week.setdefault(week, []).append((i, j))
+    busiest = max(by_week.values(), key=len) if by_week else []
+
+    if not divisions:
+        order = [None] * num_teams
+        for (i, j), (a, b) in zip(busiest, circle_rounds(range(num_teams))[0]):
+            order[a], order[b] = i, j
+        rest = iter(t for t in range(num_teams) if t not in order)
+        return [t if t is not None else next(rest) for t in order], []
+
+    division_of = {t: d for d, division in enumerate(divisions) for t in division}
+    size = len(divisions[0])
+    orders = [[None] * size for _ in divisions]
+    intra_slots = [iter(circle_rounds(range(size))[0]) for _ in divisions]
+    # Odd-sized divisions play rotation 0 only between the teams sitting out, A[0] - B[0] in round 0
+    inter_slots = [0] if size % 2 else range(size)
+    for i, j in busiest:
+        di, dj = division_of[i], division_of[j]
+        if di == dj:
+            slot = next(intra_slots[di], None)
+            if slot is not None and orders[di][slot[0]] is None and orders[di][slot[1]] is None:
+                orders[di][slot[0]], orders[di][slot[1]] = i, j
+        else:
+            free = [k for k in inter_slots if orders[di][k] is None and orders[dj][k] is None]
+            if free:
+                orders[di][free[0]], orders[dj][free[0]] = i, j
+    for d, division in enumerate(divisions):
+        rest = iter(t for t in division if t not in orders[d])
+        orders[d] = [t if t is not None else next(rest) for t in orders[d]]
+    return [t for order in orders for t in order], orders
+
+
+def _round_model(num_teams, num_weeks, blocks, fixed_pairs):
+    # play[w, b] == 1 when round b is played in week w. The fixed matchups may force rounds out of
+    # season_order; the objective keeps as many weeks as possible in it.
+    model = cp_model.CpModel()
+    play = np.array([[model.NewBoolVar(f'round_{b}_w{w}') for b in range(len(blocks))]
+                     for w in range(num_weeks)], dtype=object)
+    for w in range(num_weeks):
+        model.AddExactlyOne(play[w].tolist())
+    for b, (_, fewest, most) in enumerate(blocks):
+        model.AddLinearConstraint(cp_model.LinearExpr.Sum(play[:, b].tolist()), fewest, most)
+        for w in range(num_weeks - REMATCH_GAP + 1):
+            model.AddAtMostOne(play[w:w + REMATCH_GAP, b].tolist())
+
+    block_of = {frozenset(pair): b for b, (pairs, _, _) in enumerate(blocks) for pair in pairs}
+    for week, i, j in fixed_pairs:
+        model.Add(play[week, block_of[frozenset((i, j))]] == 1)
+
+    order = season_order(blocks, num_weeks)
+    if len(order) == num_weeks:
+        for w, b in enumerate(order):
+            model.AddHint(play[w, b], True)
+        model.Minimize(num_weeks - cp_model.LinearExpr.Sum([play[w, b] for w, b in enumerate(order)]))
+
+    def decode(solver):
+        opponents = np.full((num_weeks, num_teams), -1, dtype=np.int8)
+        for w in range(num_weeks):
+            b = next(b for b in range(len(blocks)) if solver.BooleanValue(play[w, b]))
+            for i, j in blocks[b][0]:
+                opponents[w, i], opponents[w, j] = j, i
+        return opponents
+
+    def chosen(solver):
+        return [var for var in play.ravel() if solver.BooleanValue(var)]
+
+    return model, decode, chosen
+
+
+def _pair_model(num_teams, num_weeks, divisions, fixed_pairs, excluded=()):
+    # Fallback for leagues without a round pattern: meet[w, i, j] literals, as in the pair layout.
+    # excluded: timetables (opponent matrices) already tried, which are cut off
+    model = cp_model.CpModel()
+    pairs = [(i, j) for i in range(num_teams) for j in range(i + 1, num_teams)]
+    meet = {}
+    for w in range(num_weeks):
+        for i, j in pairs:
+            meet[w, i, j] = meet[w, j, i] = model.NewBoolVar(f'meet_w{w}_{i}_{j}')
+    for w in range(num_weeks):
+        for t in range(num_teams):
+            model.AddExactlyOne([meet[w, t, o] for o in range(num_teams) if o != t])
+
+    division_of = {t: d for d, division in enumerate(divisions) for t in division}
+    for i, j in pairs:
+        meetings = [meet[w, i, j] for w in range(num_weeks)]
+        for w in range(num_weeks - REMATCH_GAP + 1):
+            model.AddAtMostOne(meetings[w:w + REMATCH_GAP])
+        if divisions and (i not in division_of or j not in division_of):
+            continue
+        if divisions and division_of[i] == division_of[j]:
+            model.Add(cp_model.LinearExpr.Sum(meetings) == 2)
+        elif divisions and num_weeks < 14:
+            model.Add(cp_model.LinearExpr.Sum(meetings) == 1)
+        else:
+            model.AddLinearConstraint(cp_model.LinearExpr.Sum(meetings), 1, 2)
+    for week, i, j in fixed_pairs:
+        model.Add(meet[week, i, j] == 1)
+    for opponents in excluded:
+        model.AddBoolOr([meet[w, i, int(opponents[w, i])].Not()
+                         for w in range(num_weeks) for i in range(num_teams) if i < opponents[w, i]])
+
+    def decode(solver):
+        opponents = np.full((num_weeks, num_teams), -1, dtype=np.int8)
+        for (w, i, j), var in meet.items():
+            if solver.BooleanValue(var):
+                opponents[w, i] = j
+        return opponents
+
+    def chosen(solver):
+        return [meet[w, i, j] for w in range(num_weeks) for i, j in pairs if solver.BooleanValue(meet[w, i, j])]
+
+    return model, decode, chosen
+
+
+def timetables(num_teams, num_weeks, divisions, fixed_pairs, deadline, num_workers=None, cancel_event=None):
+    # Yields distinct timetables (week x team opponent matrices) that meet the league's pairing
+    # rules: one game per week, meetings per pair, the rematch gap and the fixed matchups given as
+    # (0-indexed week, i, j). Uses the round pattern when the league has one, and the pair model
+    # once the round pattern has no (further) timetable, e.g. when it cannot place the fixed
+    # matchups. Each timetable is cut off before the next solve, in both models.
+    builders = []
+    if round_blocks(list(range(num_teams)), num_weeks, divisions) is not None:
+        teams, ordered_divisions = relabel(num_teams, divisions, fixed_pairs)
+        blocks = round_blocks(teams, num_weeks, ordered_divisions)
+        builders.append(lambda: _round_model(num_teams, num_weeks, blocks, fixed_pairs))
+    builders.append(lambda: _pair_model(num_teams, num_weeks, divisions, fixed_pairs, found))
+
+    found = []
+    for build in builders:
+        model, decode, chosen = build()
+        optimized = model.HasObjective()
+        while True:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0 or (cancel_event is not None and cancel_event.is_set()):
+                return
+            solver = cp_model.CpSolver()
+            solver.parameters.max_time_in_seconds = min(remaining, TIMETABLE_TIME_LIMIT) if optimized else remaining
+            if num_workers:
+                solver.parameters.num_workers = num_workers
+            with stop_on_cancel(solver, cancel_event):
+                status = solver.Solve(model)
+            if status == cp_model.INFEASIBLE:
+                # No timetable left in this model (the round pattern may be too rigid for the fixed
+                # matchups or for a home/away assignment): go on with the pair model
+                break
+            if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+                return
+            literals = chosen(solver)
+            found.append(decode(solver))
+            yield found[-1]
+            model.AddBoolOr([literal.Not() for literal in literals])
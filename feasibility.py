@@ -0,0 +1,201 @@
+import math
+import time
+
+from ortools.sat.python import cp_model
+
+DIRECTIONS = ('either', 'team1_away', 'team2_away')
+
+# Two meetings of the same pair must be at least this many weeks apart (no rematch within 4 weeks)
+REMATCH_GAP = 5
+
+
+def describe(matchup):
+    return f"{matchup['team1']} vs {matchup['team2']} in week {matchup['week']}"
+
+
+def conflict(reason, matchups=()):
+    return {'reason': reason, 'fixed_matchups': list(matchups)}
+
+
+def input_errors(teams, num_weeks, use_divisions, division_teams, fixed_matchups):
+    # Malformed requests: unknown or duplicate teams, weeks outside the season, bad directions
+    errors = []
+    known = set(teams)
+    if len(known) != len(teams):
+        errors.append('Team names must be unique')
+
+    if use_divisions and division_teams:
+        seen = set()
+        for division in division_teams:
+            for team in division:
+                if team not in known:
+                    errors.append(f'Unknown team in divisions: {team}')
+                elif team in seen:
+                    errors.append(f'{team} is in more than one division')
+                seen.add(team)
+
+    for matchup in fixed_matchups or []:
+        try:
+            team1, team2, week, direction = (matchup['team1'], matchup['team2'], matchup['week'],
+                                             matchup['direction'])
+        except (KeyError, TypeError):
+            errors.append(f'Fixed matchups need team1, team2, week and direction: {matchup}')
+            continue
+        for team in (team1, team2):
+            if team not in known:
+                errors.append(f'Unknown team in fixed matchup: {team}')
+        if team1 == team2:
+            errors.append(f'{team1} cannot play itself in week {week}')
+        if not isinstance(week, int) or isinstance(week, bool):
+            errors.append(f'Fixed matchup week must be an integer: {team1} vs {team2} (week {week!r})')
+        elif not 1 <= week <= num_weeks:
+            errors.append(f'Fixed matchup week must be between 1 and {num_weeks}: {describe(matchup)}')
+        if direction not in DIRECTIONS:
+            errors.append(f"Unknown direction '{direction}' for {describe(matchup)}")
+    return errors
+
+
+def find_conflicts(teams, num_weeks, divisions, fixed_matchups):
+    # Rules of the scheduling model that the request violates on its own, found in linear time
+    # without building the model. Each conflict names the fixed matchups involved, if any.
+    conflicts = []
+    num_teams = len(teams)
+    team_indices = {team: i for i, team in enumerate(teams)}
+    inter_meetings = 2 if num_weeks >= 14 else 1
+
+    # Season length against the league structure
+    full_divisions = bool(divisions) and sorted(t for div in divisions for t in div) == list(range(num_teams))
+    if full_divisions:
+        endpoints = []
+        for d, div in enumerate(divisions):
+            size = len(div)
+            fewest = 2 * (size - 1) + (num_teams - size)
+            most = 2 * (size - 1) + inter_meetings * (num_teams - size)
+            if not fewest <= num_weeks <= most:
+                conflicts.append(conflict(
+                    f'Teams in division {d + 1} ({size} teams) play {fewest} to {most} games, '
+                    f'which cannot fill a {num_weeks}-week season'))
+                continue
+            # Inter-division games per team are whatever weeks the divisional double round-robin leaves
+            endpoints.append(size * (num_weeks - 2 * (size - 1)))
+            if size % 2 and endpoints[-1] < num_weeks:
+                conflicts.append(conflict(
+                    f'Division {d + 1} has an odd number of teams, so one of them plays outside the '
+                    f'division every week, but the season leaves only {endpoints[-1]} such games'))
+        if len(endpoints) == len(divisions):
+            total = sum(endpoints)
+            if total % 2 or (len(divisions) > 1 and any(2 * e > total for e in endpoints)):
+                conflicts.append(conflict(
+                    'Division sizes do not allow every inter-division game to be matched with an '
+                    f'opponent from another division in a {num_weeks}-week season'))
+    elif not divisions and num_weeks > 2 * (num_teams - 1):
+        conflicts.append(conflict(
+            f'Season too long. {num_teams} teams can fill at most {2 * (num_teams - 1)} weeks '
+            'playing each opponent at most twice.'))
+
+    if not fixed_matchups:
+        return conflicts
+
+    division_of = {t: d for d, div in enumerate(divisions or []) for t in div}
+    min_home_games = (num_weeks - 1) // 2
+    max_home_games = math.ceil(num_weeks / 2)
+    lo = max(min_home_games, num_weeks - max_home_games)
+    hi = min(max_home_games, num_weeks - min_home_games)
+
+    games = {}  # (team, week) -> matchup
+    pair_games = {}  # (i, j) -> {week: matchup}
+    venue = {}  # (team, week) -> (is_home, matchup)
+    for matchup in fixed_matchups:
+        week = matchup['week']
+        team1, team2 = team_indices[matchup['team1']], team_indices[matchup['team2']]
+        pair = (min(team1, team2), max(team1, team2))
+
+        for team in (team1, team2):
+            other = games.setdefault((team, week), matchup)
+            if other is not matchup and {other['team1'], other['team2']} != {matchup['team1'], matchup['team2']}:
+                name = matchup['team1'] if team == team1 else matchup['team2']
+                conflicts.append(conflict(f'{name} is fixed to play twice in week {week}', [other, matchup]))
+        pair_games.setdefault(pair, {}).setdefault(week, matchup)
+
+        if matchup['direction'] != 'either':
+            host = team2 if matchup['direction'] == 'team1_away' else team1
+            for team in (team1, team2):
+                other = venue.setdefault((team, week), (team == host, matchup))
+                if other[0] != (team == host):
+                    name = matchup['team1'] if team == team1 else matchup['team2']
+                    conflicts.append(conflict(f'{name} is fixed both home and away in week {week}',
+                                              [other[1], matchup]))
+
+    for (i, j), by_week in pair_games.items():
+        weeks = sorted(by_week)
+        for a, b in zip(weeks, weeks[1:]):
+            if b - a < REMATCH_GAP:
+                conflicts.append(conflict(
+                    f'Rematch within 4 weeks: {describe(by_week[a])} and week {b}', [by_week[a], by_week[b]]))
+        # The model leaves pairs with a team outside every division unconstrained
+        if divisions and (i not in division_of or j not in division_of):
+            continue
+        allowed = 2
+        if full_divisions and division_of[i] != division_of[j]:
+            allowed = inter_meetings
+        if len(weeks) > allowed:
+            conflicts.append(conflict(
+                f"{by_week[weeks[0]]['team1']} and {by_week[weeks[0]]['team2']} are fixed to meet "
+                f'{len(weeks)} times but can meet at most {allowed}', list(by_week.values())))
+        # Only divisional pairs (or every pair without divisions) must swap venues when meeting twice
+        swaps = not divisions or division_of[i] == division_of[j]
+        hosts = [(w, venue[(i, w)][0]) for w in weeks if (i, w) in venue]
+        if swaps and len(weeks) == 2 and len(hosts) == 2 and hosts[0][1] == hosts[1][1]:
+            conflicts.append(conflict(
+                'Teams that meet twice play once at each venue, but both games are fixed at the same venue',
+                list(by_week.values())))
+
+    fixed_venues = {}
+    for (team, week), fixed_venue in venue.items():
+        fixed_venues.setdefault(team, []).append((week, fixed_venue))
+    for team, fixed in fixed_venues.items():
+        fixed.sort(key=lambda item: item[0])
+        home_games = [m for _, (is_home, m) in fixed if is_home]
+        away_games = [m for _, (is_home, m) in fixed if not is_home]
+        if len(home_games) > hi:
+            conflicts.append(conflict(f'{teams[team]} is fixed at home more than {hi} times', home_games))
+        if len(away_games) > num_weeks - lo:
+            conflicts.append(conflict(f'{teams[team]} is fixed away more than {num_weeks - lo} times', away_games))
+        for (w1, (h1, m1)), (w2, (h2, m2)), (w3, (h3, m3)) in zip(fixed, fixed[1:], fixed[2:]):
+            if w3 - w1 == 2 and h1 == h2 == h3:
+                side = 'home' if h1 else 'away'
+                conflicts.append(conflict(f'{teams[team]} is fixed to play {side} in weeks {w1}-{w3}', [m1, m2, m3]))
+    return conflicts
+
+
+def explain_infeasibility(model, fixed_matchups, time_limit):
+    # Smallest set of fixed matchups that cannot all hold together with the league rules, given
+    # a model built with one assumption literal per fixed matchup (in order).
+    # Returns None if the request is not proven infeasible within the time limit; an empty
+    # list means the league rules are infeasible even without fixed matchups. time_limit covers
+    # every re-solve; when it runs out the core found so far is returned.
+    deadline = time.perf_counter() + time_limit
+    matchup_of = {index: k for k, index in enumerate(model.Proto().assumptions)}
+
+    solver = cp_model.CpSolver()
+    solver.parameters.max_time_in_seconds = time_limit
+    if solver.Solve(model) != cp_model.INFEASIBLE:
+        return None
+    core = list(solver.SufficientAssumptionsForInfeasibility())
+
+    # CP-SAT's core is sufficient but not necessarily minimal: drop each matchup in turn and
+    # keep it out whenever the rest is still infeasible
+    for index in list(core):
+        if index not in core:
+            continue
+        remaining = deadline - time.perf_counter()
+        if remaining <= 0:
+            break
+        rest = [i for i in core if i != index]
+        model.ClearAssumptions()
+        model.AddAssumptions(model.GetBoolVarFromProtoIndex(i) for i in rest)
+        solver.parameters.max_time_in_seconds = remaining
+        if solver.Solve(model) == cp_model.INFEASIBLE:
+            shrunk = set(solver.SufficientAssumptionsForInfeasibility())
+            core = [i for i in rest if i in shrunk]
+    return [fixed_matchups[matchup_of[i]] for i in sorted(core, key=matchup_of.get)]
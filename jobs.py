@@ -0,0 +1,256 @@
+import contextlib
+import itertools
+import multiprocessing
+import queue
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+
+class QueueFull(Exception):
+    pass
+
+
+@contextlib.contextmanager
+def stop_on_cancel(solver, cancel_event, poll_interval=0.1):
+    # Call solver.StopSearch() from a watcher thread if cancel_event is set while the body runs
+    if cancel_event is None:
+        yield
+        return
+
+    solve_done = threading.Event()
+
+    def watch():
+        while not solve_done.is_set():
+            if cancel_event.wait(poll_interval):
+                solver.StopSearch()
+                return
+
+    watcher = threading.Thread(target=watch, daemon=True)
+    watcher.start()
+    try:
+        yield
+    finally:
+        solve_done.set()
+        watcher.join()
+
+
+def _run_job(solve, kwargs, events, cancel_event):
+    # Runs in a pool worker: stream each solution back through the events queue
+    # and return the final result without the (already streamed) solutions.
+    events.put(('running', None))
+    result = solve(**kwargs,
+                   on_solution=lambda schedule: events.put(('solution', schedule)),
+                   cancel_event=cancel_event)
+    result.pop('solutions', None)
+    return result
+
+
+class Job:
+    def __init__(self, job_id, events=None, cancel_event=None, on_complete=None, league=None):
+        self.id = job_id
+        # The LeagueSpec being solved, for exports that need team order and season length
+        self.league = league
+        self.state = 'queued'
+        self.result = None
+        self.error = None
+        self.cached = False
+        self.solutions = []
+        self.future = None
+        self.__events = events
+        self.__cancel_event = cancel_event
+        self.__on_complete = on_complete
+        self.__lock = threading.Lock()
+        self.__changed = threading.Condition(self.__lock)
+
+    def start(self, pool, solve, kwargs):
+        self.future = pool.submit(_run_job, solve, kwargs, self.__events, self.__cancel_event)
+        self.future.add_done_callback(self._finish)
+
+    def start_local(self, run):
+        # Runs run(emit, cancel_event) on a thread of this process instead of a pool worker: each
+        # emitted item becomes one of the job's solutions and the returned dict its result
+        def target():
+            with self.__lock:
+                self.state = 'running'
+            try:
+                result = run(self._emit, self.__cancel_event)
+            except Exception as e:
+                with self.__lock:
+                    self.state = 'failed'
+                    self.error = str(e)
+                    self.__changed.notify_all()
+                return
+            with self.__lock:
+                self.result = result
+                self.state = 'cancelled' if self.__cancel_event.is_set() else 'done'
+                self.__changed.notify_all()
+
+        threading.Thread(target=target, daemon=True).start()
+
+    def _emit(self, item):
+        with self.__lock:
+            self.solutions.append(item)
+            self.__changed.notify_all()
+
+    @property
+    def finished(self):
+        return self.state in ('done', 'cancelled', 'failed')
+
+    def _drain(self):
+        # Move any solutions the worker has produced into self.solutions
+        while self.__events is not None:
+            try:
+                kind, payload = self.__events.get_nowait()
+            except queue.Empty:
+                return
+            if kind == 'running' and self.state == 'queued':
+                self.state = 'running'
+            elif kind == 'solution':
+                self.solutions.append(payload)
+
+    def _finish(self, future):
+        with self.__lock:
+            self._drain()
+            if future.cancelled():
+                self.state = 'cancelled'
+            elif future.exception() is not None:
+                self.state = 'failed'
+                self.error = str(future.exception())
+            else:
+                self.result = future.result()
+                self.state = 'cancelled' if self.__cancel_event.is_set() else 'done'
+            self.__changed.notify_all()
+        if self.state == 'done' and self.__on_complete is not None:
+            self.__on_complete(dict(self.result, solutions=list(self.solutions)))
+
+    def _complete(self, result):
+        # Finish immediately with a result computed elsewhere (e.g. the schedule cache)
+        with self.__lock:
+            self.solutions = list(result['solutions'])
+            self.result = {key: value for key, value in result.items() if key != 'solutions'}
+            self.state = 'done'
+            self.__changed.notify_all()
+
+    def cancel(self):
+        with self.__lock:
+            if self.finished:
+                return False
+            self.__cancel_event.set()
+        # A job that has not started yet never reaches the solver
+        if self.future is not None:
+            self.future.cancel()
+        return True
+
+    def status(self):
+        with self.__lock:
+            self._drain()
+            status = {
+                'job_id': self.id,
+                'state': self.state,
+                'solution_count': len(self.solutions),
+            }
+            if self.result is not None:
+                status['solver_status'] = self.result['status']
+                if 'message' in self.result:
+                    status['message'] = self.result['message']
+                if 'conflicts' in self.result:
+                    status['conflicts'] = self.result['conflicts']
+                for key in ('distinct_count', 'distinct_count_exact', 'min_distance', 'objective', 'score',
+                            'warm_start', 'relaxed', 'violation_counts', 'violations', 'leagues', 'sources'):
+                    if key in self.result:
+                        status[key] = self.result[key]
+                if 'metrics' in self.result:
+                    status['metrics'] = self.result['metrics']
+            if self.error is not None:
+                status['message'] = self.error
+            if self.cached:
+                status['cached'] = True
+            return status
+
+    def iter_solutions(self, poll_interval=0.25):
+        # Yield solutions as they arrive, starting from the first one, until the job ends
+        for index in itertools.count():
+            with self.__lock:
+                while True:
+                    self._drain()
+                    if index < len(self.solutions) or self.finished:
+                        break
+                    self.__changed.wait(poll_interval)
+                if index >= len(self.solutions):
+                    return
+                solution = self.solutions[index]
+            yield solution
+
+
+class JobQueue:
+    def __init__(self, solve, max_workers=2, max_pending=8, max_finished=100):
+        self.__solve = solve
+        self.__max_workers = max_workers
+        self.__max_pending = max_pending
+        self.__max_finished = max_finished
+        self.__jobs = OrderedDict()
+        self.__lock = threading.Lock()
+        context = multiprocessing.get_context('spawn')
+        self.__manager = context.Manager()
+        self.__pool = ProcessPoolExecutor(max_workers=max_workers, mp_context=context)
+
+    def submit(self, on_complete=None, league=None, **kwargs):
+        with self.__lock:
+            self._check_capacity()
+            job = Job(uuid.uuid4().hex, self.__manager.Queue(), self.__manager.Event(), on_complete, league)
+            self.__jobs[job.id] = job
+            job.start(self.__pool, self.__solve, kwargs)
+            return job
+
+    def submit_local(self, run):
+        # A job driven by run(emit, cancel_event) on a thread of this process (see Job.start_local),
+        # e.g. a batch that hands its solves to submit_task
+        with self.__lock:
+            self._check_capacity()
+            job = Job(uuid.uuid4().hex, cancel_event=threading.Event())
+            self.__jobs[job.id] = job
+            job.start_local(run)
+            return job
+
+    def submit_task(self, fn, *args):
+        # Run fn(*args) on the job pool's workers, so that it shares their CPU budget; returns a Future
+        return self.__pool.submit(fn, *args)
+
+    def add_cached(self, result, league=None):
+        with self.__lock:
+            self._evict_finished()
+            job = Job(uuid.uuid4().hex, league=league)
+            job.cached = True
+            job._complete(result)
+            self.__jobs[job.id] = job
+            return job
+
+    def counts(self):
+        with self.__lock:
+            counts = {state: 0 for state in ('queued', 'running', 'done', 'cancelled', 'failed')}
+            for job in self.__jobs.values():
+                counts[job.state] += 1
+            return counts
+
+    def get(self, job_id):
+        with self.__lock:
+            return self.__jobs.get(job_id)
+
+    def _check_capacity(self):
+        active = sum(not job.finished for job in self.__jobs.values())
+        if active >= self.__max_workers + self.__max_pending:
+            raise QueueFull(f'Too many scheduling jobs in progress ({active}); try again later.')
+        self._evict_finished()
+
+    def _evict_finished(self):
+        finished = [job_id for job_id, job in self.__jobs.items() if job.finished]
+        for job_id in finished[:max(0, len(finished) - self.__max_finished)]:
+            del self.__jobs[job_id]
+
+    def shutdown(self):
+        for job in list(self.__jobs.values()):
+            job.cancel()
+        self.__pool.shutdown(wait=False, cancel_futures=True)
+        self.__manager.shutdown()
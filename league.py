@@ -0,0 +1,1193 @@
+import copy
+import logging
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from functools import cached_property
+
+import numpy as np
+from ortools.sat.python import cp_model
+
+from decompose import timetables
+from feasibility import describe, explain_infeasibility, find_conflicts, input_errors
+from jobs import stop_on_cancel
+from metrics import capture_solver_log, model_metrics, solver_metrics
+from portfolio import portfolio_seeds, solve_portfolio
+from schedule import Schedule, schedule_from_dict
+from symmetry import add_symmetry_breaking, distinct_result, symmetry_groups
+from validation import validate_schedule
+
+logger = logging.getLogger(__name__)
+
+# Re-validate every solution found by the solver (slow; for debugging model changes)
+DEBUG_CHECKS = os.environ.get('SCHEDULER_DEBUG_CHECKS') == '1'
+
+# 'enumerate' lists the first feasible schedules found by a single search;
+# 'portfolio' runs differently seeded parallel solves and keeps the distinct results;
+# 'optimize' returns the best schedule found for the requested objective(s);
+# 'diverse' re-solves one model, requiring each schedule to differ from all earlier ones;
+# 'decompose' fixes a timetable first and then solves home/away (see decompose.py);
+# 'relax' returns the schedule that breaks the fewest (weighted) rule constraints
+SOLVE_MODES = ('enumerate', 'portfolio', 'optimize', 'diverse', 'decompose', 'relax')
+
+# Leagues smaller than this are solved with the full model even in 'decompose' mode
+DECOMPOSE_MIN_TEAMS = 16
+
+# Default share of a season's games in which each diverse schedule must differ from the others
+DIVERSE_MIN_SHARE = 0.25
+
+# Rules that solve_mode='relax' may break, with the default penalty per broken constraint
+# (a team's balance, a 3-week window, a 5-week rematch window, a pair, a fixed matchup).
+# one_game_per_week always holds.
+RELAX_PENALTIES = {
+    'home_away_balance': 1,
+    'no_three_streak': 1,
+    'rematch_gap': 1,
+    'round_robin': 1,
+    'fixed_matchups': 1,
+}
+
+# Solve budget of 'relax' requests that do not set a time limit, in seconds
+RELAX_TIME_LIMIT = 10.0
+
+# A re-plan stops once its changed-games count is within this share of the proven bound, or
+# when no better schedule has turned up for REPLAN_PATIENCE seconds
+REPLAN_GAP_LIMIT = 0.05
+REPLAN_PATIENCE = 0.25
+
+
+@dataclass
+class LeagueSpec:
+    # A league to schedule. Divisions are lists of team names; fixed matchups are
+    # {'team1', 'team2', 'week' (1-indexed), 'direction'} dicts as sent to /generate.
+    teams: list
+    num_weeks: int
+    divisions: list = field(default_factory=list)
+    fixed_matchups: list = field(default_factory=list)
+
+    @classmethod
+    def from_request(cls, teams, num_weeks, use_divisions, division_teams=None, fixed_matchups=None):
+        divisions = [list(division) for division in division_teams or []] if use_divisions else []
+        return cls(list(teams), int(num_weeks), divisions, list(fixed_matchups or []))
+
+    @property
+    def num_teams(self):
+        return len(self.teams)
+
+    @cached_property
+    def team_indices(self):
+        return {team: i for i, team in enumerate(self.teams)}
+
+    @cached_property
+    def division_indices(self):
+        return [[self.team_indices[team] for team in division] for division in self.divisions]
+
+    def home_game_bounds(self):
+        # Even seasons split home and away evenly; odd seasons allow a difference of one
+        min_home_games = (self.num_weeks - 1) // 2
+        max_home_games = math.ceil(self.num_weeks / 2)
+        return (max(min_home_games, self.num_weeks - max_home_games),
+                min(max_home_games, self.num_weeks - min_home_games))
+
+
+def check_schedule(opponents, home):
+    # Vectorized sanity checks over a week x team opponent matrix and home flags.
+    # The model already enforces these rules, so this only runs in debug mode.
+    problems = []
+    num_weeks, num_teams = opponents.shape
+    weeks = np.arange(num_weeks)[:, None]
+    teams = np.arange(num_teams)[None, :]
+
+    if (opponents < 0).any() or (opponents == teams).any() or (opponents[weeks, opponents] != teams).any():
+        problems.append('teams are not paired up every week')
+    elif (home == home[weeks, opponents]).any():
+        problems.append('a game does not have exactly one home team')
+
+    # 3-week window sums of home games must be 1 or 2
+    cumulative = np.vstack([np.zeros((1, num_teams), dtype=int), np.cumsum(home, axis=0)])
+    windows = cumulative[3:] - cumulative[:-3]
+    if ((windows == 0) | (windows == 3)).any():
+        problems.append('a team has 3+ consecutive home or away games')
+
+    for gap in range(1, 5):
+        if (opponents[:-gap] == opponents[gap:]).any():
+            problems.append(f'a rematch is only {gap} week(s) apart')
+            break
+
+    return problems
+
+
+class SolutionCounter(cp_model.CpSolverSolutionCallback):
+    def __init__(self, limit, decode, teams, on_solution=None, debug=DEBUG_CHECKS):
+        cp_model.CpSolverSolutionCallback.__init__(self)
+        self.__solution_count = 0
+        self.__solution_limit = limit
+        self.__decode = decode
+        self.__teams = teams
+        self.__on_solution = on_solution
+        self.__debug = debug
+        self.__solutions = []
+        self.__first_solution_time = None
+        self.__callback_time = 0.0
+
+    def on_solution_callback(self):
+        start = time.perf_counter()
+        if self.__first_solution_time is None:
+            self.__first_solution_time = self.WallTime()
+
+        # Read every variable value in one call and decode into opponent/home matrices
+        opponents, home = self.__decode(np.fromiter(self.response_proto.solution, dtype=np.int64))
+
+        if self.__debug:
+            problems = check_schedule(opponents, home)
+            if problems:
+                logger.warning('Discarding invalid solution: %s', '; '.join(problems))
+                self.__callback_time += time.perf_counter() - start
+                return
+
+        self.__solution_count += 1
+        # Store the solution bit-packed; decoded to dicts only when returned
+        schedule = Schedule(opponents, home, self.__teams)
+        self.__solutions.append(schedule)
+        if self.__on_solution is not None:
+            self.__on_solution(schedule)
+        self.__callback_time += time.perf_counter() - start
+        if self.__solution_count >= self.__solution_limit:
+            self.StopSearch()
+
+    def first_solution_time(self):
+        # Solver wall time in seconds when the first solution arrived, or None
+        return self.__first_solution_time
+
+    def callback_time(self):
+        return self.__callback_time
+
+    def solution_count(self):
+        return self.__solution_count
+
+    def schedules(self):
+        return self.__solutions
+
+    def matrices(self):
+        return [schedule.matrices() for schedule in self.__solutions]
+
+    def solutions(self):
+        return [schedule.to_dict() for schedule in self.__solutions]
+
+
+class StallStop(cp_model.CpSolverSolutionCallback):
+    # Stops `solver` once `patience` seconds pass without a new (better) solution
+    def __init__(self, solver, patience):
+        cp_model.CpSolverSolutionCallback.__init__(self)
+        self.__solver = solver
+        self.__patience = patience
+        self.__timer = None
+
+    def on_solution_callback(self):
+        self.cancel()
+        self.__timer = threading.Timer(self.__patience, self.__solver.StopSearch)
+        self.__timer.daemon = True
+        self.__timer.start()
+
+    def cancel(self):
+        if self.__timer is not None:
+            self.__timer.cancel()
+
+
+# Variable layouts. Rules only talk to a layout through these literal lists, so the same
+# rule builds either backend:
+# - meet_window(i, j, start, stop): literals that sum to the meetings of i and j in those weeks
+# - home_window(t, start, stop): literals that sum to t's home games in those weeks
+# - host_window(i, j, start, stop): literals that sum to the games i hosts j in those weeks
+# - week_literals(w, t): literals of which exactly one is true when t plays in week w
+# - home_var(w, t): a single literal that is true when t plays at home in week w
+# - played_literals(opponents, home, weeks): one literal per game of a decoded schedule, true
+#   when the new schedule plays that game (same visitor and host) in the same week
+# Variables live in NumPy object arrays so windows are array slices rather than nested loops.
+
+class GameLayout:
+    # One BoolVar per (week, visitor, home); game[w, i, j] == 1 means team i plays at team j in week w.
+    # previous: (opponents, home) of an earlier schedule; its locked_weeks (0-indexed) become constants.
+    def __init__(self, model, spec, previous=None, locked_weeks=()):
+        num_weeks, num_teams, teams = spec.num_weeks, spec.num_teams, spec.teams
+        self.__others = ~np.eye(num_teams, dtype=bool)
+        self.__games = [(i, j) for i in range(num_teams) for j in range(num_teams) if i != j]
+
+        game = np.full((num_weeks, num_teams, num_teams), None, dtype=object)
+        for w in range(num_weeks):
+            if w in locked_weeks:
+                played = (previous[0][w][:, None] == np.arange(num_teams)) & previous[1][w][None, :]
+                for i, j in self.__games:
+                    game[w, i, j] = model.NewConstant(int(played[i, j]))
+            else:
+                for i, j in self.__games:
+                    game[w, i, j] = model.NewBoolVar(f'game_w{w}_{teams[i]}_at_{teams[j]}')
+        self.game = game
+        self.__model = model
+        self.__home = {}
+
+        # Variable index of game[w, i, j]; the diagonal points past the end of the solution (always 0)
+        self.__game_index = np.full(game.shape, -1)
+        self.__game_index[:, self.__others] = [[var.Index() for var in week[self.__others]] for week in game]
+
+    def bind(self, model):
+        # This layout over a clone of its model: variables are shared by index, lazily created
+        # home variables are created in the clone from then on
+        layout = copy.copy(self)
+        layout.__model = model
+        layout.__home = dict(self.__home)
+        return layout
+
+    def meet_window(self, i, j, start, stop):
+        return self.game[start:stop, i, j].tolist() + self.game[start:stop, j, i].tolist()
+
+    def home_window(self, t, start, stop):
+        return self.game[start:stop, self.__others[t], t].ravel().tolist()
+
+    def host_window(self, i, j, start, stop):
+        return self.game[start:stop, j, i].tolist()
+
+    def week_literals(self, w, t):
+        others = self.__others[t]
+        return self.game[w, t, others].tolist() + self.game[w, others, t].tolist()
+
+    def meet_literals(self, w, i, j):
+        return self.meet_window(i, j, w, w + 1)
+
+    def home_literals(self, w, t):
+        return self.home_window(t, w, w + 1)
+
+    def home_var(self, w, t):
+        # Created on first use: equal to the sum of t's home games in week w
+        if (w, t) not in self.__home:
+            h = self.__model.NewBoolVar(f'home_w{w}_{t}')
+            self.__model.Add(h == cp_model.LinearExpr.Sum(self.home_literals(w, t)))
+            self.__home[(w, t)] = h
+        return self.__home[(w, t)]
+
+    def previous_games(self, model, previous, locked_weeks):
+        # Hints the previous schedule and returns the literals of its games outside locked weeks
+        prev_opponents, prev_home = previous
+        weeks = [w for w in range(self.game.shape[0]) if w not in locked_weeks]
+        self.hint_schedule(model, prev_opponents, prev_home, weeks)
+        return self.played_literals(prev_opponents, prev_home, weeks)
+
+    def hint_schedule(self, model, opponents, home, weeks):
+        # Hint every game literal of `weeks` from a schedule (weeks without opponents are skipped)
+        for w in weeks:
+            for i, j in self.__games:
+                if opponents[w, i] < 0:
+                    continue
+                model.AddHint(self.game[w, i, j], bool(opponents[w, i] == j and home[w, j]))
+
+    def played_literals(self, opponents, home, weeks):
+        # One literal per game of (opponents, home) in `weeks`, true when that visitor plays at that host again
+        return [self.game[w, i, opponents[w, i]] for w in weeks for i in range(self.game.shape[1])
+                if opponents[w, i] >= 0 and not home[w, i]]
+
+    def decode(self, solution):
+        g = np.append(solution, 0)[self.__game_index]
+        opponents = (g + g.transpose(0, 2, 1)).argmax(axis=2).astype(np.int8)
+        home = g.sum(axis=1).astype(bool)
+        return opponents, home
+
+
+class PairLayout:
+    # Compact round-robin/slot layout:
+    # - meet[w, i, j] == meet[w, j, i] == 1 means teams i and j play each other in week w
+    # - home[w, t] == 1 means team t is the home team in week w
+    # Directional literals are only created for pairs whose home/away split is constrained.
+    def __init__(self, model, spec, previous=None, locked_weeks=()):
+        num_weeks, num_teams, teams = spec.num_weeks, spec.num_teams, spec.teams
+        self.__model = model
+        self.__teams = teams
+        self.__others = ~np.eye(num_teams, dtype=bool)
+        self.__hosts = {}
+        pair_i, pair_j = np.triu_indices(num_teams, 1)
+        self.__pairs = list(zip(pair_i.tolist(), pair_j.tolist()))
+
+        meet = np.full((num_weeks, num_teams, num_teams), None, dtype=object)
+        home = np.full((num_weeks, num_teams), None, dtype=object)
+        for w in range(num_weeks):
+            if w in locked_weeks:
+                for i, j in self.__pairs:
+                    meet[w, i, j] = meet[w, j, i] = model.NewConstant(int(previous[0][w, i] == j))
+                for t in range(num_teams):
+                    home[w, t] = model.NewConstant(int(previous[1][w, t]))
+            else:
+                for i, j in self.__pairs:
+                    meet[w, i, j] = meet[w, j, i] = model.NewBoolVar(f'meet_w{w}_{teams[i]}_{teams[j]}')
+                for t in range(num_teams):
+                    home[w, t] = model.NewBoolVar(f'home_w{w}_{teams[t]}')
+        self.meet = meet
+        self.home = home
+
+        # Exactly one side of each game is home
+        for w in range(num_weeks):
+            for i, j in self.__pairs:
+                model.Add(home[w, i] + home[w, j] == 1).OnlyEnforceIf(meet[w, i, j])
+
+        self.__pair_i = pair_i.astype(np.int8)
+        self.__pair_j = pair_j.astype(np.int8)
+        self.__meet_index = np.array([[var.Index() for var in week[pair_i, pair_j]] for week in meet])
+        self.__home_index = np.array([[var.Index() for var in week] for week in home])
+
+    def bind(self, model):
+        # This layout over a clone of its model (see GameLayout.bind)
+        layout = copy.copy(self)
+        layout.__model = model
+        layout.__hosts = dict(self.__hosts)
+        return layout
+
+    def hosts(self, w, i, j):
+        # Literal for "team i hosts team j in week w", created on first use
+        if (w, i, j) not in self.__hosts:
+            model = self.__model
+            h = model.NewBoolVar(f'hosts_w{w}_{self.__teams[i]}_{self.__teams[j]}')
+            m, home = self.meet[w, i, j], self.home[w, i]
+            model.AddBoolAnd([m, home]).OnlyEnforceIf(h)
+            model.AddBoolOr([m.Not(), home.Not(), h])
+            self.__hosts[(w, i, j)] = h
+        return self.__hosts[(w, i, j)]
+
+    def meet_window(self, i, j, start, stop):
+        return self.meet[start:stop, i, j].tolist()
+
+    def home_window(self, t, start, stop):
+        return self.home[start:stop, t].tolist()
+
+    def host_window(self, i, j, start, stop):
+        return [self.hosts(w, i, j) for w in range(start, stop)]
+
+    def week_literals(self, w, t):
+        return self.meet[w, t, self.__others[t]].tolist()
+
+    def meet_literals(self, w, i, j):
+        return [self.meet[w, i, j]]
+
+    def home_literals(self, w, t):
+        return [self.home[w, t]]
+
+    def home_var(self, w, t):
+        return self.home[w, t]
+
+    def previous_games(self, model, previous, locked_weeks):
+        # Hints the previous schedule and returns the literals of its games outside locked weeks:
+        # a game t hosted last time is kept only if t still hosts the same visitor
+        prev_opponents, prev_home = previous
+        weeks = [w for w in range(self.meet.shape[0]) if w not in locked_weeks and (prev_opponents[w] >= 0).all()]
+        self.hint_schedule(model, prev_opponents, prev_home, weeks)
+        return self.played_literals(prev_opponents, prev_home, weeks)
+
+    def hint_schedule(self, model, opponents, home, weeks):
+        # Hint the meet and home literals of `weeks` from a schedule (weeks must be complete)
+        for w in weeks:
+            for i, j in self.__pairs:
+                model.AddHint(self.meet[w, i, j], bool(opponents[w, i] == j))
+            for t in range(len(self.__teams)):
+                model.AddHint(self.home[w, t], bool(home[w, t]))
+
+    def played_literals(self, opponents, home, weeks):
+        # One literal per game of (opponents, home) in `weeks`, true when that host plays that visitor again
+        return [self.hosts(w, t, int(opponents[w, t])) for w in weeks for t in range(len(self.__teams))
+                if home[w, t] and opponents[w, t] >= 0]
+
+    def decode(self, solution):
+        num_weeks, num_teams = self.__home_index.shape
+        weeks, met = np.nonzero(solution[self.__meet_index])
+        opponents = np.full((num_weeks, num_teams), -1, dtype=np.int8)
+        opponents[weeks, self.__pair_i[met]] = self.__pair_j[met]
+        opponents[weeks, self.__pair_j[met]] = self.__pair_i[met]
+        return opponents, solution[self.__home_index].astype(bool)
+
+
+class PatternLayout:
+    # Home/away over a fixed timetable (opponents[w, t], as yielded by decompose.timetables).
+    # home[w, t] are the only variables; a pair's meetings are constant true literals in the
+    # weeks the timetable has them play.
+    def __init__(self, model, spec, opponents):
+        num_weeks, num_teams = opponents.shape
+        self.__opponents = opponents
+        self.__true = model.NewConstant(1)
+        self.home = np.array([[model.NewBoolVar(f'home_w{w}_{spec.teams[t]}') for t in range(num_teams)]
+                              for w in range(num_weeks)], dtype=object)
+
+        # Exactly one side of each game is home
+        for w in range(num_weeks):
+            for t in range(num_teams):
+                if t < opponents[w, t]:
+                    model.AddExactlyOne([self.home[w, t], self.home[w, opponents[w, t]]])
+        self.__home_index = np.array([[var.Index() for var in week] for week in self.home])
+
+    def meet_window(self, i, j, start, stop):
+        return [self.__true] * int((self.__opponents[start:stop, i] == j).sum())
+
+    def home_window(self, t, start, stop):
+        return self.home[start:stop, t].tolist()
+
+    def host_window(self, i, j, start, stop):
+        return [self.home[w, i] for w in range(start, stop) if self.__opponents[w, i] == j]
+
+    def week_literals(self, w, t):
+        return [self.__true]
+
+    def meet_literals(self, w, i, j):
+        return self.meet_window(i, j, w, w + 1)
+
+    def home_literals(self, w, t):
+        return [self.home[w, t]]
+
+    def home_var(self, w, t):
+        return self.home[w, t]
+
+    def decode(self, solution):
+        return self.__opponents, solution[self.__home_index].astype(bool)
+
+
+MODEL_BACKENDS = {
+    'game': GameLayout,
+    'pair': PairLayout,
+}
+
+# League rules, applied in registration order. Each builder is called as
+# rule(model, spec, layout, options) and adds its constraints through the layout.
+RULES = {}
+
+
+def rule(name):
+    def register(builder):
+        RULES[name] = builder
+        return builder
+    return register
+
+
+def relaxed(model, options, name, label):
+    # Enforcement literals for one constraint of rule `name`: none, unless options['relax'] maps
+    # the rule to a list of violation literals (solve_mode='relax'). Then the constraint only
+    # holds while a new violation literal, appended to that list, is false.
+    relax = options.get('relax')
+    if relax is None or name not in relax:
+        return []
+    violated = model.NewBoolVar(f'violated_{label}')
+    relax[name].append(violated)
+    return [violated.Not()]
+
+
+@rule('one_game_per_week')
+def one_game_per_week(model, spec, layout, options):
+    # (1) Each team plays exactly one game per week
+    for w in range(spec.num_weeks):
+        for t in range(spec.num_teams):
+            model.AddExactlyOne(layout.week_literals(w, t))
+
+
+@rule('home_away_balance')
+def home_away_balance(model, spec, layout, options):
+    # (2) Home/away balance: even seasons split evenly, odd seasons differ by at most one game
+    lo, hi = spec.home_game_bounds()
+    for t in range(spec.num_teams):
+        model.AddLinearConstraint(cp_model.LinearExpr.Sum(layout.home_window(t, 0, spec.num_weeks)), lo, hi) \
+            .OnlyEnforceIf(relaxed(model, options, 'home_away_balance', f'balance_{t}'))
+
+
+@rule('no_three_streak')
+def no_three_streak(model, spec, layout, options):
+    # (3) No team can have 3+ consecutive home/away games: every 3-week window has 1 or 2 home games
+    for t in range(spec.num_teams):
+        for w in range(spec.num_weeks - 2):
+            model.AddLinearConstraint(cp_model.LinearExpr.Sum(layout.home_window(t, w, w + 3)), 1, 2) \
+                .OnlyEnforceIf(relaxed(model, options, 'no_three_streak', f'streak_w{w}_{t}'))
+
+
+@rule('rematch_gap')
+def rematch_gap(model, spec, layout, options):
+    # (4) No team can play the same opponent within 4 weeks: at most one meeting in any 5-week window
+    for i in range(spec.num_teams):
+        for j in range(i + 1, spec.num_teams):
+            for w in range(spec.num_weeks - 4):
+                model.AddAtMostOne(layout.meet_window(i, j, w, w + 5)) \
+                    .OnlyEnforceIf(relaxed(model, options, 'rematch_gap', f'rematch_w{w}_{i}_{j}'))
+
+
+@rule('round_robin')
+def round_robin(model, spec, layout, options):
+    # (5) Meetings per pair, based on divisions and season length
+    num_weeks = spec.num_weeks
+    division_of = {t: d for d, division in enumerate(spec.division_indices) for t in division}
+    for i in range(spec.num_teams):
+        for j in range(i + 1, spec.num_teams):
+            if spec.divisions and (i not in division_of or j not in division_of):
+                continue
+            meetings = cp_model.LinearExpr.Sum(layout.meet_window(i, j, 0, num_weeks))
+            enforce = relaxed(model, options, 'round_robin', f'pair_{i}_{j}')
+            if spec.divisions:
+                if division_of[i] == division_of[j]:
+                    # Divisional double round-robin: home and away
+                    model.Add(meetings == 2).OnlyEnforceIf(enforce)
+                    model.Add(cp_model.LinearExpr.Sum(layout.host_window(i, j, 0, num_weeks)) == 1).OnlyEnforceIf(enforce)
+                elif num_weeks >= 14:
+                    # Inter-divisional matchups: at least once, up to twice in 14+ week seasons
+                    model.AddLinearConstraint(meetings, 1, 2).OnlyEnforceIf(enforce)
+                else:
+                    model.Add(meetings == 1).OnlyEnforceIf(enforce)
+            else:
+                # Every pair meets once or twice; a second meeting swaps home and away
+                model.AddLinearConstraint(meetings, 1, 2).OnlyEnforceIf(enforce)
+                plays_twice = model.NewBoolVar(f'plays_twice_{i}_{j}')
+                model.Add(meetings == 2).OnlyEnforceIf([plays_twice] + enforce)
+                model.Add(meetings == 1).OnlyEnforceIf([plays_twice.Not()] + enforce)
+                model.Add(cp_model.LinearExpr.Sum(layout.host_window(i, j, 0, num_weeks)) == 1) \
+                    .OnlyEnforceIf([plays_twice] + enforce)
+
+
+@rule('fixed_matchups')
+def fixed_matchups(model, spec, layout, options):
+    # (6) User-fixed matchups. With options['assume_fixed'] each one is switched on by an
+    # assumption literal, in matchup order, so an infeasible request can be traced back to them.
+    for k, matchup in enumerate(spec.fixed_matchups):
+        week = matchup['week'] - 1  # Convert to 0-indexed
+        team1 = spec.team_indices[matchup['team1']]
+        team2 = spec.team_indices[matchup['team2']]
+        enforce = relaxed(model, options, 'fixed_matchups', f'fixed_matchup_{k}')
+        if options.get('assume_fixed'):
+            enforce.append(model.NewBoolVar(f'fixed_matchup_{k}'))
+            model.AddAssumption(enforce[-1])
+
+        model.Add(cp_model.LinearExpr.Sum(layout.meet_literals(week, team1, team2)) == 1).OnlyEnforceIf(enforce)
+        if matchup['direction'] == 'team1_away':
+            model.Add(cp_model.LinearExpr.Sum(layout.home_literals(week, team2)) == 1).OnlyEnforceIf(enforce)
+        elif matchup['direction'] == 'team2_away':
+            model.Add(cp_model.LinearExpr.Sum(layout.home_literals(week, team1)) == 1).OnlyEnforceIf(enforce)
+
+
+# Schedule quality measures for solve_mode='optimize', all minimized. Each builder is called as
+# objective(model, spec, layout) and returns a linear expression over new or layout literals.
+OBJECTIVES = {}
+
+# CP-SAT only runs its improvement (LNS) workers in a multi-worker search, so optimize mode uses
+# this many search workers, even on machines with fewer cores, unless the caller sets num_workers
+OPTIMIZE_MIN_WORKERS = 8
+
+# Rematches closer than this fraction of the season count against 'rematch_spacing'
+REMATCH_SPACING = 0.5
+
+
+def objective(name):
+    def register(builder):
+        OBJECTIVES[name] = builder
+        return builder
+    return register
+
+
+@objective('breaks')
+def home_away_breaks(model, spec, layout):
+    # Breaks: a team at the same venue in two consecutive weeks
+    breaks = []
+    for t in range(spec.num_teams):
+        for w in range(spec.num_weeks - 1):
+            a, b = layout.home_var(w, t), layout.home_var(w + 1, t)
+            brk = model.NewBoolVar(f'break_w{w}_{t}')
+            # Minimizing pushes brk down to exactly (a == b)
+            model.AddBoolOr([a.Not(), b.Not(), brk])
+            model.AddBoolOr([a, b, brk])
+            breaks.append(brk)
+    return cp_model.LinearExpr.Sum(breaks)
+
+
+@objective('rematch_spacing')
+def close_rematches(model, spec, layout):
+    # Closeness of rematches: one point for every window of REMATCH_SPACING of the season that
+    # holds both meetings of a pair, so a rematch d weeks apart costs about (window - d)
+    window = max(5, round(spec.num_weeks * REMATCH_SPACING))
+    close = []
+    for i in range(spec.num_teams):
+        for j in range(i + 1, spec.num_teams):
+            for w in range(spec.num_weeks - window + 1):
+                c = model.NewBoolVar(f'close_rematch_w{w}_{i}_{j}')
+                model.Add(cp_model.LinearExpr.Sum(layout.meet_window(i, j, w, w + window)) - 1 <= c)
+                close.append(c)
+    return cp_model.LinearExpr.Sum(close)
+
+
+@objective('division_doubles')
+def unbalanced_doubles(model, spec, layout):
+    # Inter-division pairs that meet twice with the same team hosting both games
+    # (divisional and non-divisional rematches already swap venues)
+    if not spec.divisions or spec.num_weeks < 14:
+        return cp_model.LinearExpr.Sum([])
+    division_of = {t: d for d, division in enumerate(spec.division_indices) for t in division}
+    unbalanced = []
+    for i in range(spec.num_teams):
+        for j in range(spec.num_teams):
+            if i == j or division_of.get(i, -1) == division_of.get(j, -1):
+                continue
+            u = model.NewBoolVar(f'hosts_twice_{i}_{j}')
+            model.Add(cp_model.LinearExpr.Sum(layout.host_window(i, j, 0, spec.num_weeks)) - 1 <= u)
+            unbalanced.append(u)
+    return cp_model.LinearExpr.Sum(unbalanced)
+
+
+def objective_stages(objective, lexicographic=False):
+    # Normalizes an objective request into a list of {name: weight} stages solved in order:
+    # a name, a list of names (equal weights, or one stage each when lexicographic), or a
+    # {name: weight} dict. Returns (stages, error message).
+    if objective is None:
+        objective = 'breaks'
+    if isinstance(objective, str):
+        stages = [{objective: 1}]
+    elif isinstance(objective, dict):
+        stages = [dict(objective)]
+    elif isinstance(objective, (list, tuple)) and objective:
+        stages = [{name: 1} for name in objective] if lexicographic else [{name: 1 for name in objective}]
+    else:
+        return None, 'Objective must be a name, a list of names or a {name: weight} object'
+    for weights in stages:
+        for name, weight in weights.items():
+            if name not in OBJECTIVES:
+                return None, f'Unknown objective: {name}'
+            if not isinstance(weight, int) or isinstance(weight, bool) or weight < 0:
+                return None, f'Objective weight must be a non-negative integer: {name}'
+    return stages, None
+
+
+def relax_penalties(penalties):
+    # RELAX_PENALTIES updated with a request's {rule: weight}; a weight of 0 drops the rule.
+    # Returns (weights, error message).
+    if penalties is None:
+        penalties = {}
+    if not isinstance(penalties, dict):
+        return None, 'Penalties must be a {rule: weight} object'
+    for name, weight in penalties.items():
+        if name not in RELAX_PENALTIES:
+            return None, f"Rule cannot be relaxed: {name} (choose from {', '.join(RELAX_PENALTIES)})"
+        if not isinstance(weight, int) or isinstance(weight, bool) or weight < 0:
+            return None, f'Penalty must be a non-negative integer: {name}'
+    return dict(RELAX_PENALTIES, **penalties), None
+
+
+# Rules that depend on more than the league's shape; every other rule is built once per
+# (backend, teams, weeks, divisions) into a template model that requests clone
+REQUEST_RULES = ('fixed_matchups',)
+
+# Template models kept per process, least recently used dropped first
+MAX_MODEL_TEMPLATES = 32
+
+_model_templates = OrderedDict()
+_model_templates_lock = threading.Lock()
+
+
+def model_template(spec, model_backend='game'):
+    # A fresh clone of the shape's template model, built on first use. Template variables are
+    # named after team indices, since leagues of one shape share it. Returns (model, layout).
+    division_indices = tuple(tuple(division) for division in spec.division_indices)
+    key = (model_backend, spec.num_teams, spec.num_weeks, division_indices)
+    with _model_templates_lock:
+        template = _model_templates.get(key)
+        if template is None:
+            teams = [str(t) for t in range(spec.num_teams)]
+            shape = LeagueSpec(teams, spec.num_weeks, [[teams[t] for t in division] for division in division_indices])
+            model = cp_model.CpModel()
+            layout = MODEL_BACKENDS[model_backend](model, shape)
+            for name in RULES:
+                if name not in REQUEST_RULES:
+                    RULES[name](model, shape, layout, {})
+            template = _model_templates[key] = (model, layout)
+            if len(_model_templates) > MAX_MODEL_TEMPLATES:
+                _model_templates.popitem(last=False)
+        _model_templates.move_to_end(key)
+        model, layout = template
+        clone = model.Clone()
+    return clone, layout.bind(clone)
+
+
+def build_layout(spec, model_backend='game', rules=None, symmetry=None, previous=None, locked_weeks=(),
+                 assume_fixed=False, relax=None):
+    # Builds the league rules (all of RULES, or the named subset) on the chosen layout.
+    # The full rule set starts from the shape's template. relax: {rule: []} of rules that may
+    # be broken, each list receiving that rule's violation literals. Returns (model, layout).
+    if rules is None and previous is None and relax is None:
+        model, layout = model_template(spec, model_backend)
+        rules = REQUEST_RULES
+    else:
+        model = cp_model.CpModel()
+        layout = MODEL_BACKENDS[model_backend](model, spec, previous, locked_weeks)
+    options = {'assume_fixed': assume_fixed, 'relax': relax}
+    for name in RULES if rules is None else rules:
+        RULES[name](model, spec, layout, options)
+
+    # (7) Optionally rule out schedules that are relabelings of each other
+    if symmetry:
+        add_symmetry_breaking(model, spec.num_weeks, symmetry,
+                              meet_literals=layout.meet_literals, home_literals=layout.home_literals)
+    return model, layout
+
+
+def build_model(spec, model_backend='game', rules=None, symmetry=None, previous=None, locked_weeks=(),
+                assume_fixed=False):
+    # build_layout, plus the re-plan objective when a previous schedule is given.
+    # Returns (model, decode); decode maps a solution vector to (opponents, home) matrices.
+    model, layout = build_layout(spec, model_backend, rules, symmetry, previous, locked_weeks, assume_fixed)
+
+    # (8) When re-planning, start from the previous schedule and change as few games as possible
+    if previous is not None:
+        kept = layout.previous_games(model, previous, locked_weeks)
+        model.Minimize(len(kept) - cp_model.LinearExpr.Sum(kept))
+
+    return model, layout.decode
+
+
+def error_result(message):
+    return {
+        'status': 'ERROR',
+        'message': message,
+        'solution_count': 0,
+        'solutions': []
+    }
+
+
+def infeasible_result(conflicts):
+    return {
+        'status': 'INFEASIBLE',
+        'message': '; '.join(c['reason'] for c in conflicts),
+        'conflicts': conflicts,
+        'solution_count': 0,
+        'solutions': []
+    }
+
+
+def precheck(spec, model_backend, relax=False):
+    # Rejects malformed or provably infeasible requests before any model is built, or returns None.
+    # With relax, conflicting fixed matchups are left to the solve.
+    if spec.num_teams % 2 != 0:
+        return error_result('Number of teams must be even')
+    if spec.num_weeks < spec.num_teams - 1:
+        return error_result(f'Season too short. Need at least {spec.num_teams - 1} weeks for each team to play each other once.')
+    if model_backend not in MODEL_BACKENDS:
+        return error_result(f'Unknown model backend: {model_backend}')
+    errors = input_errors(spec.teams, spec.num_weeks, bool(spec.divisions), spec.divisions, spec.fixed_matchups)
+    if errors:
+        return error_result('; '.join(errors))
+    if relax:
+        return None
+    conflicts = find_conflicts(spec.teams, spec.num_weeks, spec.division_indices, spec.fixed_matchups)
+    if conflicts:
+        return infeasible_result(conflicts)
+    return None
+
+
+def explain_conflicts(spec, model_backend, time_limit):
+    # Names the fixed matchups behind an INFEASIBLE solve, using CP-SAT assumptions
+    model, _ = build_model(spec, model_backend, assume_fixed=True)
+    matchups = explain_infeasibility(model, spec.fixed_matchups, time_limit)
+    if matchups is None:
+        return {}
+    if not matchups:
+        conflicts = [{'reason': 'The league rules cannot be met for this season, even without fixed matchups',
+                      'fixed_matchups': []}]
+    else:
+        conflicts = [{'reason': 'These fixed matchups cannot all be scheduled together: '
+                                + ', '.join(describe(m) for m in matchups),
+                      'fixed_matchups': matchups}]
+    return {'message': conflicts[0]['reason'], 'conflicts': conflicts}
+
+
+def optimize(model, expressions, stages, time_limit, num_workers=None, cancel_event=None, search_log=False):
+    # Minimizes each stage's weighted sum of objective expressions in turn. Every later stage is
+    # hinted with the schedule of the one before and may not make an earlier stage's score worse.
+    # num_workers defaults to at least OPTIMIZE_MIN_WORKERS.
+    # Returns (status name, solution values or None, objective values, stage scores, solver metrics).
+    deadline = time.perf_counter() + time_limit
+    values, objective_values, scores, solve_metrics = None, {}, [], {}
+    proven, solve_seconds = True, 0.0
+    for weights in stages:
+        remaining = deadline - time.perf_counter()
+        if remaining <= 0 or (cancel_event is not None and cancel_event.is_set()):
+            proven = False
+            break
+        stage = cp_model.LinearExpr.WeightedSum([expressions[name] for name in weights], list(weights.values()))
+        model.Minimize(stage)
+        if values is not None:
+            model.ClearHints()
+            for index, value in enumerate(values):
+                model.AddHint(model.GetIntVarFromProtoIndex(index), value)
+
+        solver = cp_model.CpSolver()
+        solver.parameters.max_time_in_seconds = remaining
+        solver.parameters.num_workers = num_workers or max(os.cpu_count() or 1, OPTIMIZE_MIN_WORKERS)
+        log_lines = capture_solver_log(solver, search_log)
+        with stop_on_cancel(solver, cancel_event):
+            status = solver.Solve(model)
+        solve_seconds += solver.WallTime()
+        solve_metrics = dict(solver_metrics(solver, status, log_lines), solve_ms=solve_seconds * 1000)
+        if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+            if values is None:
+                return solver.StatusName(status), None, {}, [], solve_metrics
+            # Out of time in a later stage: keep the previous stage's schedule
+            proven = False
+            break
+
+        values = list(solver.ResponseProto().solution)
+        objective_values = {name: int(solver.Value(expr)) for name, expr in expressions.items()}
+        scores.append(int(solver.ObjectiveValue()))
+        proven = proven and status == cp_model.OPTIMAL
+        # Lexicographic: later stages keep this stage at least as good as found
+        model.Add(stage <= scores[-1])
+    if values is None:
+        return 'UNKNOWN', None, {}, [], solve_metrics
+    return 'OPTIMAL' if proven else 'FEASIBLE', values, objective_values, scores, solve_metrics
+
+
+def solve_diverse(model, layout, spec, num_solutions, min_distance, time_limit, num_workers=None,
+                  on_solution=None, cancel_event=None):
+    # Solves the same model up to num_solutions times. After each schedule, a cut requires every
+    # later schedule to play at most (games - min_distance) of its games again, visitor, host and
+    # week included. Returns (status name, [(opponents, home)]).
+    deadline = time.perf_counter() + time_limit
+    num_games = spec.num_weeks * spec.num_teams // 2
+    found = []
+    status_name = 'UNKNOWN'
+    for attempt in range(num_solutions):
+        remaining = deadline - time.perf_counter()
+        if remaining <= 0 or (cancel_event is not None and cancel_event.is_set()):
+            break
+        solver = cp_model.CpSolver()
+        solver.parameters.max_time_in_seconds = remaining
+        solver.parameters.random_seed = attempt
+        if num_workers:
+            solver.parameters.num_workers = num_workers
+        with stop_on_cancel(solver, cancel_event):
+            status = solver.Solve(model)
+        status_name = solver.StatusName(status)
+        if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+            break
+
+        opponents, home = layout.decode(np.fromiter(solver.ResponseProto().solution, dtype=np.int64))
+        found.append((opponents, home))
+        if on_solution is not None:
+            on_solution(opponents, home)
+        # No-good cut, widened to a Hamming distance
+        model.Add(cp_model.LinearExpr.Sum(layout.played_literals(opponents, home, range(spec.num_weeks)))
+                  <= num_games - min_distance)
+
+    if found:
+        # Running out of time or of sufficiently different schedules still returns what was found
+        return 'FEASIBLE', found
+    return status_name, found
+
+
+# Rules left for phase 2 of 'decompose': the timetable already has one game per team and week,
+# the right number of meetings per pair and the rematch gap
+PATTERN_RULES = ('home_away_balance', 'no_three_streak', 'round_robin', 'fixed_matchups')
+
+
+def solve_decomposed(spec, num_solutions, time_limit, on_solution=None, cancel_event=None, num_workers=None):
+    # Two-phase solve for large leagues: take timetables from decompose.timetables until one has a
+    # valid home/away assignment, then enumerate up to num_solutions assignments over it.
+    # Returns (status name, SolutionCounter or None, stats).
+    deadline = time.perf_counter() + time_limit
+    fixed_pairs = [(m['week'] - 1, spec.team_indices[m['team1']], spec.team_indices[m['team2']])
+                   for m in spec.fixed_matchups]
+    stats = {'timetables': 0, 'timetable_ms': 0.0, 'home_away_ms': 0.0}
+    phase_start = time.perf_counter()
+    for opponents in timetables(spec.num_teams, spec.num_weeks, spec.division_indices, fixed_pairs, deadline,
+                                num_workers, cancel_event):
+        stats['timetables'] += 1
+        stats['timetable_ms'] += (time.perf_counter() - phase_start) * 1000
+
+        phase_start = time.perf_counter()
+        model = cp_model.CpModel()
+        layout = PatternLayout(model, spec, opponents)
+        for name in PATTERN_RULES:
+            RULES[name](model, spec, layout, {})
+        solver = cp_model.CpSolver()
+        solver.parameters.max_time_in_seconds = max(deadline - time.perf_counter(), 0.001)
+        solution_counter = SolutionCounter(num_solutions, layout.decode, spec.teams, on_solution)
+        with stop_on_cancel(solver, cancel_event):
+            status = solver.SearchForAllSolutions(model, solution_counter)
+        stats['home_away_ms'] += (time.perf_counter() - phase_start) * 1000
+        if solution_counter.solution_count():
+            return solver.StatusName(status), solution_counter, stats
+        if status != cp_model.INFEASIBLE:
+            break
+        # No home/away assignment fits this timetable: try the next one
+        phase_start = time.perf_counter()
+    stopped = time.perf_counter() >= deadline or (cancel_event is not None and cancel_event.is_set())
+    return 'UNKNOWN' if stopped else 'INFEASIBLE', None, stats
+
+
+# One function per solve mode, each returning (status name, [Schedule], metrics, extra result
+# fields) and calling on_schedule(Schedule) as schedules are found. solve() adds the shared
+# result fields, so a new mode only needs its search.
+
+def timed_search(spec, search, on_schedule=None):
+    # Runs search(emit), which calls emit(opponents, home) for every schedule it finds and returns
+    # (status name, [(opponents, home)]). Returns (status name, [Schedule], metrics) with the solve
+    # time, time to first solution and solution rate.
+    solve_start = time.perf_counter()
+    first_solution = []
+
+    def emit(opponents, home):
+        if not first_solution:
+            first_solution.append(time.perf_counter() - solve_start)
+        if on_schedule is not None:
+            on_schedule(Schedule(opponents, home, spec.teams))
+
+    status_name, found = search(emit)
+    solve_seconds = time.perf_counter() - solve_start
+    metrics = {
+        'solve_ms': solve_seconds * 1000,
+        'time_to_first_solution_ms': first_solution[0] * 1000 if first_solution else None,
+        'solutions_per_sec': len(found) / solve_seconds if solve_seconds > 0 else 0.0,
+        'solver_status': status_name,
+    }
+    return status_name, [Schedule(opponents, home, spec.teams) for opponents, home in found], metrics
+
+
+def enumerate_schedules(model, layout, spec, num_solutions, time_limit, on_schedule=None, cancel_event=None,
+                        search_log=False):
+    # 'enumerate': the first num_solutions schedules of a single search
+    solver = cp_model.CpSolver()
+    solver.parameters.max_time_in_seconds = time_limit
+    log_lines = capture_solver_log(solver, search_log)
+    solution_counter = SolutionCounter(num_solutions, layout.decode, spec.teams, on_schedule)
+    with stop_on_cancel(solver, cancel_event):
+        status = solver.SearchForAllSolutions(model, solution_counter)
+
+    first_solution_time = solution_counter.first_solution_time()
+    metrics = solver_metrics(solver, status, log_lines)
+    metrics.update(
+        time_to_first_solution_ms=first_solution_time * 1000 if first_solution_time is not None else None,
+        solutions_per_sec=solution_counter.solution_count() / solver.WallTime() if solver.WallTime() > 0 else 0.0,
+        callback_ms=solution_counter.callback_time() * 1000,
+    )
+    return solver.StatusName(status), solution_counter.schedules(), metrics, {}
+
+
+def diverse_schedules(model, layout, spec, num_solutions, min_distance, time_limit, num_workers=None,
+                      on_schedule=None, cancel_event=None):
+    # 'diverse': up to num_solutions schedules, each differing from the others in min_distance
+    # games (default: DIVERSE_MIN_SHARE of the season's games)
+    num_games = spec.num_weeks * spec.num_teams // 2
+    if min_distance is None:
+        min_distance = max(1, round(num_games * DIVERSE_MIN_SHARE))
+    min_distance = min(min_distance, num_games)
+    status_name, found, metrics = timed_search(
+        spec, lambda emit: solve_diverse(model, layout, spec, num_solutions, min_distance, time_limit, num_workers,
+                                         on_solution=emit, cancel_event=cancel_event), on_schedule)
+    return status_name, found, metrics, {'min_distance': min_distance}
+
+
+def portfolio_schedules(model, layout, spec, num_solutions, seeds, time_limit, num_workers=None,
+                        on_schedule=None, cancel_event=None):
+    # 'portfolio': N good schedules from independently seeded multi-worker solves
+    status_name, found, metrics = timed_search(
+        spec, lambda emit: solve_portfolio(model, layout.decode, num_solutions, num_workers or os.cpu_count() or 1,
+                                           seeds, time_limit, on_solution=emit, cancel_event=cancel_event),
+        on_schedule)
+    return status_name, found, metrics, {}
+
+
+def best_schedule(model, layout, spec, expressions, stages, time_limit, num_workers=None, on_schedule=None,
+                  cancel_event=None, search_log=False):
+    # 'optimize': the best schedule for the objective, or for each lexicographic stage in turn
+    status_name, values, objective_values, scores, metrics = optimize(
+        model, expressions, stages, time_limit, num_workers, cancel_event, search_log)
+    metrics.update(solver_status=status_name, stages=len(scores))
+    found = []
+    if values is not None:
+        found = [Schedule(*layout.decode(np.array(values, dtype=np.int64)), spec.teams)]
+        if on_schedule is not None:
+            on_schedule(found[0])
+    return status_name, found, metrics, {'objective': objective_values, 'score': scores}
+
+
+def relaxed_schedule(model, layout, spec, expressions, stages, time_limit, num_workers=None, on_schedule=None,
+                     cancel_event=None, search_log=False):
+    # 'relax': the schedule whose broken constraints (counted per rule) weigh least, with its rule
+    # violations as /validate reports them
+    status_name, found, metrics, extra = best_schedule(model, layout, spec, expressions, stages, time_limit,
+                                                       num_workers, on_schedule, cancel_event, search_log)
+    extra = {'relaxed': extra['objective'], 'score': extra['score']}
+    if found:
+        report = validate_schedule(spec, found[0])
+        extra.update(violation_counts=report['violation_counts'], violations=report['violations'])
+    return status_name, found, metrics, extra
+
+
+def decomposed_schedules(spec, num_solutions, time_limit, num_workers=None, on_schedule=None, cancel_event=None):
+    # 'decompose' for large leagues: see solve_decomposed
+    solve_start = time.perf_counter()
+    status_name, solution_counter, metrics = solve_decomposed(spec, num_solutions, time_limit, on_schedule,
+                                                              cancel_event, num_workers)
+    found = solution_counter.schedules() if solution_counter else []
+    first_solution = solution_counter.first_solution_time() if solution_counter else None
+    solve_seconds = time.perf_counter() - solve_start
+    metrics.update(
+        solve_ms=solve_seconds * 1000,
+        time_to_first_solution_ms=(metrics['timetable_ms'] + first_solution * 1000
+                                   if first_solution is not None else None),
+        solutions_per_sec=len(found) / solve_seconds if solve_seconds > 0 else 0.0,
+        solver_status=status_name,
+    )
+    return status_name, found, metrics, {}
+
+
+def solve(spec, model_backend='game', on_solution=None, cancel_event=None, solve_mode='enumerate',
+          num_solutions=50, time_limit=120.0, num_workers=None, seeds=None, symmetry_breaking=False,
+          explain_infeasible=False, objective=None, lexicographic=False, min_distance=None, compact=False,
+          warm_start=None, penalties=None, search_log=False, distinct_count=False):
+    # Single solve entry point for the web app and the CLI. on_solution(schedule dict) is
+    # called as schedules are found; the result dict is what /generate returns. With compact,
+    # schedules are passed and returned as Schedule objects instead of dicts. warm_start is an
+    # (opponents, home) schedule of this league (e.g. from schedule_pool) used as a solver hint.
+    # penalties are the {rule: weight} of 'relax' mode (see RELAX_PENALTIES). search_log turns on
+    # the CP-SAT search log that the presolve metrics are parsed from. distinct_count adds the
+    # number of returned schedules that differ beyond the league's symmetries.
+    error = precheck(spec, model_backend, relax=solve_mode == 'relax')
+    if error:
+        return error
+    if solve_mode not in SOLVE_MODES:
+        return error_result(f'Unknown solve mode: {solve_mode}')
+    if solve_mode == 'optimize':
+        stages, message = objective_stages(objective, lexicographic)
+        if message:
+            return error_result(message)
+    if solve_mode == 'portfolio':
+        seeds, message = portfolio_seeds(seeds, num_solutions)
+        if message:
+            return error_result(message)
+    relax = None
+    if solve_mode == 'relax':
+        weights, message = relax_penalties(penalties)
+        if message:
+            return error_result(message)
+        relax = {name: [] for name, weight in weights.items() if weight}
+        stages = [{name: weights[name] for name in relax}]
+
+    output = (lambda schedule: schedule) if compact else Schedule.to_dict
+    emit_schedule = None
+    if on_solution is not None:
+        def emit_schedule(schedule):
+            on_solution(output(schedule))
+
+    # Interchangeable teams and weeks, used to break symmetry and to count distinct schedules
+    symmetry = symmetry_groups(spec.num_teams, spec.division_indices, spec.fixed_matchups, spec.team_indices)
+
+    if solve_mode == 'decompose' and spec.num_teams >= DECOMPOSE_MIN_TEAMS:
+        # Large league: timetable first, then home/away, never building the full model
+        status_name, found, metrics, extra = decomposed_schedules(spec, num_solutions, time_limit, num_workers,
+                                                                  emit_schedule, cancel_event)
+    else:
+        if solve_mode == 'decompose':
+            # Small league: the full model is fast enough
+            solve_mode = 'enumerate'
+
+        build_start = time.perf_counter()
+        # Relaxed rules with a zero penalty are left out of the model
+        rules = None if relax is None else [name for name in RULES if name not in RELAX_PENALTIES or name in relax]
+        model, layout = build_layout(spec, model_backend, rules, symmetry=symmetry if symmetry_breaking else None,
+                                     relax=relax)
+        if warm_start is not None:
+            layout.hint_schedule(model, *warm_start, range(spec.num_weeks))
+        if solve_mode == 'optimize':
+            expressions = {name: OBJECTIVES[name](model, spec, layout) for weights in stages for name in weights}
+        elif solve_mode == 'relax':
+            expressions = {name: cp_model.LinearExpr.Sum(violated) for name, violated in relax.items()}
+        metrics = model_metrics(model, time.perf_counter() - build_start)
+
+        if solve_mode == 'optimize':
+            status_name, found, solve_metrics, extra = best_schedule(
+                model, layout, spec, expressions, stages, time_limit, num_workers, emit_schedule, cancel_event,
+                search_log)
+        elif solve_mode == 'relax':
+            status_name, found, solve_metrics, extra = relaxed_schedule(
+                model, layout, spec, expressions, stages, time_limit, num_workers, emit_schedule, cancel_event,
+                search_log)
+        elif solve_mode == 'diverse':
+            status_name, found, solve_metrics, extra = diverse_schedules(
+                model, layout, spec, num_solutions, min_distance, time_limit, num_workers, emit_schedule,
+                cancel_event)
+        elif solve_mode == 'portfolio':
+            status_name, found, solve_metrics, extra = portfolio_schedules(
+                model, layout, spec, num_solutions, seeds, time_limit, num_workers, emit_schedule, cancel_event)
+        else:
+            status_name, found, solve_metrics, extra = enumerate_schedules(
+                model, layout, spec, num_solutions, time_limit, emit_schedule, cancel_event, search_log)
+        metrics.update(solve_metrics)
+
+    result = {
+        'status': status_name,
+        'solution_count': len(found),
+        'metrics': metrics,
+        'solutions': [output(schedule) for schedule in found]
+    }
+    if distinct_count:
+        result.update(distinct_result([schedule.matrices() for schedule in found], symmetry))
+    result.update(extra)
+    if explain_infeasible and status_name == 'INFEASIBLE':
+        result.update(explain_conflicts(spec, model_backend, time_limit))
+    return result
+
+
+def replan(spec, previous, locked_weeks, model_backend='pair', time_limit=10.0, search_log=False):
+    # Re-plan a season in progress: locked (already played) weeks are kept exactly as in
+    # `previous`, the remaining weeks are re-solved with the new constraints, changing as
+    # few of the previously scheduled games as possible. The search starts from `previous`
+    # and stops at REPLAN_GAP_LIMIT or REPLAN_PATIENCE; `gap` is the share of changed games
+    # that the solver could not prove necessary (0 when OPTIMAL).
+    error = precheck(spec, model_backend)
+    if error:
+        return error
+
+    if not isinstance(previous, dict):
+        return error_result('previous must map weeks to lists of [visitor, home] games')
+    try:
+        prev_opponents, prev_home = schedule_from_dict(previous, spec.teams, spec.num_weeks)
+    except KeyError as e:
+        return error_result(f'Unknown team in previous schedule: {e.args[0]}')
+    except (TypeError, ValueError):
+        return error_result('previous must map weeks to lists of [visitor, home] games')
+    if not isinstance(locked_weeks, list) \
+            or not all(isinstance(week, int) and not isinstance(week, bool) for week in locked_weeks):
+        return error_result('locked_weeks must be a list of week numbers')
+    locked = {week - 1 for week in locked_weeks}
+    incomplete = [w + 1 for w in sorted(locked) if not 0 <= w < spec.num_weeks or (prev_opponents[w] < 0).any()]
+    if incomplete:
+        return error_result(f'Locked weeks must be complete in the previous schedule: {incomplete}')
+
+    build_start = time.perf_counter()
+    model, decode = build_model(spec, model_backend, previous=(prev_opponents, prev_home), locked_weeks=locked)
+    metrics = model_metrics(model, time.perf_counter() - build_start)
+
+    solver = cp_model.CpSolver()
+    solver.parameters.max_time_in_seconds = time_limit
+    solver.parameters.relative_gap_limit = REPLAN_GAP_LIMIT
+    log_lines = capture_solver_log(solver, search_log)
+    stall_stop = StallStop(solver, REPLAN_PATIENCE)
+    try:
+        status = solver.Solve(model, stall_stop)
+    finally:
+        stall_stop.cancel()
+    metrics.update(solver_metrics(solver, status, log_lines))
+
+    if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+        return {
+            'status': solver.StatusName(status),
+            'solution_count': 0,
+            'metrics': metrics,
+            'solutions': []
+        }
+
+    schedule = Schedule(*decode(np.fromiter(solver.ResponseProto().solution, dtype=np.int64)), spec.teams)
+    objective = solver.ObjectiveValue()
+    return {
+        'status': solver.StatusName(status),
+        'solution_count': 1,
+        'changed_games': schedule.changed_games(Schedule(prev_opponents, prev_home)),
+        'gap': (objective - solver.BestObjectiveBound()) / objective if objective else 0.0,
+        'metrics': metrics,
+        'solutions': [schedule.to_dict()]
+    }
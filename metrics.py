@@ -0,0 +1,164 @@
+import math
+import re
+import threading
+from collections import defaultdict
+
+_PRESOLVE_START = re.compile(r'^Starting presolve at ([\d.]+)s')
+_SEARCH_START = re.compile(r'^Starting search at ([\d.]+)s')
+_VARIABLES = re.compile(r"^#Variables: ([\d']+)")
+_CONSTRAINTS = re.compile(r"^#k\w+: ([\d']+)")
+
+METRIC_HELP = {
+    'scheduler_solves_total': ('counter', 'Completed schedule solves by solver status.'),
+    'scheduler_solutions_total': ('counter', 'Schedules returned by completed solves.'),
+    'scheduler_model_build_seconds': ('summary', 'Time spent building the CP-SAT model in Python.'),
+    'scheduler_presolve_seconds': ('summary', 'Time spent in CP-SAT presolve.'),
+    'scheduler_solve_seconds': ('summary', 'Wall time of the CP-SAT search including presolve.'),
+    'scheduler_time_to_first_solution_seconds': ('summary', 'Wall time until the first schedule was found.'),
+    'scheduler_callback_seconds': ('summary', 'Time spent in the Python solution callback.'),
+    'scheduler_model_variables': ('summary', 'Variables in the model before presolve.'),
+    'scheduler_model_constraints': ('summary', 'Constraints in the model before presolve.'),
+    'scheduler_cache_lookups_total': ('counter', 'Schedule cache lookups by result.'),
+    'scheduler_jobs': ('gauge', 'Scheduling jobs currently tracked, by state.'),
+}
+
+
+def presolve_stats(log_lines):
+    # Presolve time and presolved model size from a CP-SAT search log
+    stats = {}
+    presolved = False
+    presolve_start = None
+    for line in log_lines:
+        for text in line.splitlines():
+            text = text.strip()
+            match = _PRESOLVE_START.match(text)
+            if match:
+                presolve_start = float(match.group(1))
+                continue
+            match = _SEARCH_START.match(text)
+            if match and presolve_start is not None:
+                stats['presolve_ms'] = (float(match.group(1)) - presolve_start) * 1000
+                continue
+            if text.startswith('Presolved '):
+                presolved = True
+                stats['presolved_constraints'] = 0
+                continue
+            if not presolved:
+                continue
+            match = _VARIABLES.match(text)
+            if match:
+                stats['presolved_variables'] = int(match.group(1).replace("'", ''))
+                continue
+            match = _CONSTRAINTS.match(text)
+            if match:
+                stats['presolved_constraints'] += int(match.group(1).replace("'", ''))
+            elif text.startswith('['):
+                # The presolved model summary ends where the next log section starts
+                presolved = False
+    return stats
+
+
+def model_metrics(model, build_seconds):
+    proto = model.Proto()
+    return {
+        'model_build_ms': build_seconds * 1000,
+        'variables': len(proto.variables),
+        'constraints': len(proto.constraints),
+    }
+
+
+def capture_solver_log(solver, enabled=True):
+    # Collect the CP-SAT search log in memory so presolve statistics can be reported.
+    # Logging stays off unless enabled: it also writes a line per solution found.
+    log_lines = []
+    if not enabled:
+        return log_lines
+    solver.parameters.log_search_progress = True
+    solver.parameters.log_to_stdout = False
+    solver.log_callback = log_lines.append
+    return log_lines
+
+
+def solver_metrics(solver, status, log_lines):
+    return dict(
+        presolve_stats(log_lines),
+        solve_ms=solver.WallTime() * 1000,
+        solver_status=solver.StatusName(status),
+        conflicts=solver.NumConflicts(),
+        branches=solver.NumBranches(),
+        response_stats=solver.ResponseStats(),
+    )
+
+
+def _format_value(value):
+    # Integers exactly and floats at full precision, so rate() on large counters stays accurate
+    if isinstance(value, int):
+        return f'{value:d}'
+    value = float(value)
+    if value.is_integer() and abs(value) < 2 ** 53:
+        return f'{int(value):d}'
+    if math.isnan(value):
+        return 'NaN'
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(value)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{value}"' for key, value in labels) + '}'
+
+
+class MetricsRegistry:
+    # Minimal in-process counters and summaries rendered in the Prometheus text format
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.__counters = defaultdict(float)
+        self.__summaries = defaultdict(lambda: [0.0, 0])
+
+    def inc(self, name, value=1, **labels):
+        with self.__lock:
+            self.__counters[(name, tuple(sorted(labels.items())))] += value
+
+    def observe(self, name, value, **labels):
+        with self.__lock:
+            summary = self.__summaries[(name, tuple(sorted(labels.items())))]
+            summary[0] += value
+            summary[1] += 1
+
+    def record_solve(self, result):
+        self.inc('scheduler_solves_total', status=result['status'])
+        self.inc('scheduler_solutions_total', result.get('solution_count', 0))
+        metrics = result.get('metrics') or {}
+        for key, name, scale in (
+                ('model_build_ms', 'scheduler_model_build_seconds', 1e-3),
+                ('presolve_ms', 'scheduler_presolve_seconds', 1e-3),
+                ('solve_ms', 'scheduler_solve_seconds', 1e-3),
+                ('time_to_first_solution_ms', 'scheduler_time_to_first_solution_seconds', 1e-3),
+                ('callback_ms', 'scheduler_callback_seconds', 1e-3),
+                ('variables', 'scheduler_model_variables', 1),
+                ('constraints', 'scheduler_model_constraints', 1)):
+            if metrics.get(key) is not None:
+                self.observe(name, metrics[key] * scale)
+
+    def render(self, gauges=()):
+        # gauges: extra (name, labels dict, value) samples computed at scrape time
+        samples = defaultdict(list)
+        with self.__lock:
+            for (name, labels), value in self.__counters.items():
+                samples[name].append((name, labels, value))
+            for (name, labels), (total, count) in self.__summaries.items():
+                samples[name].append((f'{name}_sum', labels, total))
+                samples[name].append((f'{name}_count', labels, count))
+        for name, labels, value in gauges:
+            samples[name].append((name, tuple(sorted(labels.items())), value))
+
+        lines = []
+        for name in sorted(samples):
+            kind, description = METRIC_HELP.get(name, ('untyped', name))
+            lines.append(f'# HELP {name} {description}')
+            lines.append(f'# TYPE {name} {kind}')
+            for sample_name, labels, value in sorted(samples[name]):
+                lines.append(f'{sample_name}{_format_labels(labels)} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,100 @@
+import multiprocessing
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+from ortools.sat.python import cp_model
+
+from jobs import stop_on_cancel
+from schedule import Schedule
+
+# Most seeded runs a single portfolio solve queues
+MAX_SEEDS = 64
+
+
+def _solve_seed(model_text, seed, search_workers, deadline, cancel_event):
+    # Runs in a pool worker: one randomized multi-worker solve, returning the raw solution vector
+    remaining = deadline - time.time()
+    if remaining <= 0 or (cancel_event is not None and cancel_event.is_set()):
+        return 'UNKNOWN', None
+
+    model = cp_model.CpModel()
+    model.Proto().parse_text_format(model_text)
+
+    solver = cp_model.CpSolver()
+    solver.parameters.max_time_in_seconds = remaining
+    solver.parameters.num_workers = search_workers
+    solver.parameters.random_seed = seed
+    solver.parameters.randomize_search = True
+    solver.parameters.permute_variable_randomly = True
+    solver.parameters.permute_presolve_constraint_order = True
+    solver.parameters.stop_after_first_solution = True
+
+    with stop_on_cancel(solver, cancel_event):
+        status = solver.Solve(model)
+
+    if status in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+        return solver.StatusName(status), list(solver.ResponseProto().solution)
+    return solver.StatusName(status), None
+
+
+def portfolio_seeds(seeds, default):
+    # Normalizes `seeds` (a count of runs, or a list of seeds; default when None) into a list of
+    # at most MAX_SEEDS seeds. Returns (seeds, error message).
+    if seeds is None:
+        seeds = default
+    if isinstance(seeds, int) and not isinstance(seeds, bool):
+        if seeds < 1:
+            return None, 'Seeds must be a positive integer or a list of seeds'
+        return list(range(min(seeds, MAX_SEEDS))), None
+    if not isinstance(seeds, (list, tuple)) or not seeds \
+            or not all(isinstance(s, int) and not isinstance(s, bool) and 0 <= s < 2 ** 31 for s in seeds):
+        return None, 'Seeds must be a positive integer or a list of seeds'
+    if len(seeds) > MAX_SEEDS:
+        return None, f'At most {MAX_SEEDS} seeds per request'
+    return list(seeds), None
+
+
+def solve_portfolio(model, decode, num_solutions, num_workers, seeds, time_limit,
+                    on_solution=None, cancel_event=None):
+    # Solve the same model with differently seeded CP-SAT runs spread over a process pool,
+    # keeping the first num_solutions distinct schedules. Returns (status name, [(opponents, home)]).
+    deadline = time.time() + time_limit
+    model_text = str(model.Proto())
+    seeds = (list(range(seeds)) if isinstance(seeds, int) else list(seeds))[:MAX_SEEDS]
+    processes = max(1, min(len(seeds), num_workers))
+    search_workers = max(1, num_workers // processes)
+
+    found = {}
+    statuses = set()
+    with ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context('spawn')) as pool:
+        pending = {pool.submit(_solve_seed, model_text, seed, search_workers, deadline, cancel_event)
+                   for seed in seeds}
+        try:
+            while pending and len(found) < num_solutions:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    status, values = future.result()
+                    statuses.add(status)
+                    if values is None:
+                        continue
+                    opponents, home = decode(np.array(values, dtype=np.int64))
+                    key = Schedule(opponents, home)
+                    if key in found or len(found) >= num_solutions:
+                        continue
+                    found[key] = (opponents, home)
+                    if on_solution is not None:
+                        on_solution(opponents, home)
+                if 'INFEASIBLE' in statuses or (cancel_event is not None and cancel_event.is_set()):
+                    break
+        finally:
+            for future in pending:
+                future.cancel()
+
+    if found:
+        status = 'FEASIBLE'
+    elif 'INFEASIBLE' in statuses or 'MODEL_INVALID' in statuses:
+        status = 'INFEASIBLE' if 'INFEASIBLE' in statuses else 'MODEL_INVALID'
+    else:
+        status = 'UNKNOWN'
+    return status, list(found.values())
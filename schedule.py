@@ -0,0 +1,249 @@
+import base64
+import csv
+import datetime
+import hashlib
+import json
+import struct
+
+import numpy as np
+
+# Compact schedules and bulk export. A Schedule is a week x team int8 opponent matrix plus the
+# home flags bit-packed into ceil(weeks * teams / 8) bytes, so it hashes and compares on raw
+# bytes and a 40-team, 78-week season takes about 3.5 KB instead of a dict of team-name tuples.
+#
+# Bulk formats (one header describing the league, then one record per schedule):
+# - binary: MAGIC, version, weeks, teams, team names, then fixed-size records back to back;
+# - ndjson: a {"teams", "num_weeks"} line, then {"opponents", "home"} lines in base64;
+# - csv: schedule, week, visitor, home rows; ics: one calendar of weekly all-day games.
+
+MAGIC = b'CSPS'
+FORMAT_VERSION = 1
+_HEADER = struct.Struct('<4sBHHI')
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'ics': 'text/calendar',
+    'ndjson': 'application/x-ndjson',
+    'bin': 'application/octet-stream',
+}
+
+
+def schedule_to_dict(opponents, home, teams):
+    # {week: [(visitor, home), ...]} with 1-indexed weeks, as returned by the API
+    schedule = {}
+    for w in range(opponents.shape[0]):
+        schedule[w + 1] = [(teams[t], teams[opponents[w, t]]) for t in np.flatnonzero(~home[w])]
+    return schedule
+
+
+def schedule_from_dict(schedule, teams, num_weeks):
+    # Inverse of schedule_to_dict; weeks missing from the schedule are left as -1 opponents
+    team_indices = {team: i for i, team in enumerate(teams)}
+    opponents = np.full((num_weeks, len(teams)), -1, dtype=np.int8)
+    home = np.zeros((num_weeks, len(teams)), dtype=bool)
+    for week, games in schedule.items():
+        w = int(week) - 1
+        if not 0 <= w < num_weeks:
+            continue
+        for visitor, host in games:
+            i, j = team_indices[visitor], team_indices[host]
+            opponents[w, i] = j
+            opponents[w, j] = i
+            home[w, j] = True
+    return opponents, home
+
+
+class Schedule:
+    # Immutable; `teams` (names by index) is only needed for named output
+    def __init__(self, opponents, home, teams=None):
+        opponents = np.array(opponents, dtype=np.int8)
+        opponents.flags.writeable = False
+        self.__opponents = opponents
+        self.__home = np.packbits(np.asarray(home, dtype=bool), axis=None).tobytes()
+        self.__teams = tuple(teams) if teams is not None else None
+        self.__key = opponents.tobytes() + self.__home
+
+    @classmethod
+    def from_dict(cls, schedule, teams, num_weeks):
+        return cls(*schedule_from_dict(schedule, teams, num_weeks), teams)
+
+    @classmethod
+    def from_bytes(cls, data, num_weeks, num_teams, teams=None):
+        # Inverse of to_bytes
+        size = num_weeks * num_teams
+        opponents = np.frombuffer(data, dtype=np.int8, count=size).reshape(num_weeks, num_teams)
+        packed = np.frombuffer(data, dtype=np.uint8, offset=size, count=record_size(num_weeks, num_teams) - size)
+        home = np.unpackbits(packed, count=size).reshape(num_weeks, num_teams).astype(bool)
+        return cls(opponents, home, teams)
+
+    @property
+    def opponents(self):
+        return self.__opponents
+
+    @property
+    def home(self):
+        size = self.__opponents.size
+        return np.unpackbits(np.frombuffer(self.__home, dtype=np.uint8), count=size).reshape(self.shape).astype(bool)
+
+    @property
+    def teams(self):
+        return self.__teams
+
+    @property
+    def shape(self):
+        return self.__opponents.shape
+
+    def matrices(self):
+        return self.__opponents, self.home
+
+    def to_bytes(self):
+        # Opponents row by row, then the packed home flags; weeks and teams are not included
+        return self.__key
+
+    def to_dict(self):
+        return schedule_to_dict(self.__opponents, self.home, self.__teams)
+
+    def games(self):
+        # (1-indexed week, visitor, home) for every game, named when the schedule has teams
+        opponents, home = self.__opponents, self.home
+        for w, t in zip(*np.nonzero(~home & (opponents >= 0))):
+            visitor, host = int(t), int(opponents[w, t])
+            if self.__teams is not None:
+                visitor, host = self.__teams[visitor], self.__teams[host]
+            yield int(w) + 1, visitor, host
+
+    def changed_games(self, other):
+        # Games of this schedule (week, visitor, home) that `other` does not play
+        home = self.home
+        visiting = ~home & (self.__opponents >= 0)
+        same = (self.__opponents == other.opponents) & (home == other.home)
+        return int((visiting & ~same).sum())
+
+    def __eq__(self, other):
+        if not isinstance(other, Schedule):
+            return NotImplemented
+        return self.shape == other.shape and self.__key == other.to_bytes() and self.__teams == other.teams
+
+    def __hash__(self):
+        return hash(self.__key)
+
+    def __repr__(self):
+        return f'Schedule(weeks={self.shape[0]}, teams={self.shape[1]})'
+
+
+def record_size(num_weeks, num_teams):
+    return num_weeks * num_teams + (num_weeks * num_teams + 7) // 8
+
+
+def _league(schedules):
+    # Shape and team names shared by every schedule of a bulk export
+    first = schedules[0]
+    for schedule in schedules[1:]:
+        if schedule.shape != first.shape or schedule.teams != first.teams:
+            raise ValueError('schedules in one export must share the same league')
+    return first.shape, first.teams
+
+
+def write_binary(schedules, f):
+    # `f` is a binary file object
+    if not schedules:
+        return
+    (num_weeks, num_teams), teams = _league(schedules)
+    names = json.dumps(list(teams) if teams is not None else None).encode()
+    f.write(_HEADER.pack(MAGIC, FORMAT_VERSION, num_weeks, num_teams, len(names)) + names)
+    for schedule in schedules:
+        f.write(schedule.to_bytes())
+
+
+def read_binary(f):
+    # Inverse of write_binary; every record is sliced out of one buffer
+    header = f.read(_HEADER.size)
+    if not header:
+        return []
+    magic, version, num_weeks, num_teams, names_size = _HEADER.unpack(header)
+    if magic != MAGIC or version != FORMAT_VERSION:
+        raise ValueError('not a schedule export (bad magic or version)')
+    teams = json.loads(f.read(names_size))
+    size = record_size(num_weeks, num_teams)
+    data = f.read()
+    if len(data) % size:
+        raise ValueError('truncated schedule export')
+    return [Schedule.from_bytes(data[k:k + size], num_weeks, num_teams, teams) for k in range(0, len(data), size)]
+
+
+def write_ndjson(schedules, f):
+    # `f` is a text file object
+    if not schedules:
+        return
+    (num_weeks, num_teams), teams = _league(schedules)
+    f.write(json.dumps({'teams': list(teams) if teams is not None else None,
+                        'num_weeks': num_weeks, 'num_teams': num_teams}) + '\n')
+    for schedule in schedules:
+        data = schedule.to_bytes()
+        size = schedule.opponents.size
+        f.write(json.dumps({'opponents': base64.b64encode(data[:size]).decode(),
+                            'home': base64.b64encode(data[size:]).decode()}) + '\n')
+
+
+def read_ndjson(f):
+    lines = iter(line for line in f if line.strip())
+    header = next(lines, None)
+    if header is None:
+        return []
+    league = json.loads(header)
+    schedules = []
+    for line in lines:
+        record = json.loads(line)
+        data = base64.b64decode(record['opponents']) + base64.b64decode(record['home'])
+        schedules.append(Schedule.from_bytes(data, league['num_weeks'], league['num_teams'], league['teams']))
+    return schedules
+
+
+def write_csv(schedules, f):
+    # One row per game; `f` is a text file object opened with newline=''
+    writer = csv.writer(f)
+    writer.writerow(['schedule', 'week', 'visitor', 'home'])
+    for index, schedule in enumerate(schedules, 1):
+        for week, visitor, host in sorted(schedule.games(), key=lambda game: game[0]):
+            writer.writerow([index, week, visitor, host])
+
+
+def _ical_text(value):
+    return str(value).replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,').replace('\n', '\\n')
+
+
+def write_ical(schedule, f, season_start=None, name='League schedule'):
+    # One all-day event per game, week w on season_start + 7 * (w - 1) days (default: today)
+    season_start = season_start or datetime.date.today()
+    stamp = datetime.datetime.now(datetime.timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+    uid = hashlib.sha1(schedule.to_bytes()).hexdigest()[:16]
+    lines = ['BEGIN:VCALENDAR', 'VERSION:2.0', 'PRODID:-//CSP-Scheduler//EN', 'CALSCALE:GREGORIAN',
+             f'X-WR-CALNAME:{_ical_text(name)}']
+    for week, visitor, host in sorted(schedule.games(), key=lambda game: game[0]):
+        day = season_start + datetime.timedelta(weeks=week - 1)
+        lines += ['BEGIN:VEVENT',
+                  f'UID:{uid}-w{week}-{_ical_text(visitor)}@csp-scheduler',
+                  f'DTSTAMP:{stamp}',
+                  f'DTSTART;VALUE=DATE:{day:%Y%m%d}',
+                  f'DTEND;VALUE=DATE:{day + datetime.timedelta(days=1):%Y%m%d}',
+                  f'SUMMARY:{_ical_text(visitor)} at {_ical_text(host)}',
+                  f'DESCRIPTION:Week {week}',
+                  'END:VEVENT']
+    lines.append('END:VCALENDAR')
+    # RFC 5545 lines end in CRLF
+    f.write('\r\n'.join(lines) + '\r\n')
+
+
+def export(schedules, fmt, f, season_start=None):
+    # Write schedules in one of EXPORT_FORMATS; ics takes the first schedule only
+    if fmt == 'csv':
+        write_csv(schedules, f)
+    elif fmt == 'ics':
+        if schedules:
+            write_ical(schedules[0], f, season_start)
+    elif fmt == 'ndjson':
+        write_ndjson(schedules, f)
+    elif fmt == 'bin':
+        write_binary(schedules, f)
+    else:
+        raise ValueError(f"unknown export format '{fmt}' (choose from {', '.join(EXPORT_FORMATS)})")
@@ -0,0 +1,215 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+# Bump when the model changes in a way that makes previously cached solutions stale
+CACHE_VERSION = 1
+
+# Solver statuses whose results are worth caching (a timeout might succeed with more time)
+CACHEABLE_STATUSES = ('OPTIMAL', 'FEASIBLE', 'INFEASIBLE')
+
+# Upper bound on leaves explored while searching for the canonical labeling
+MAX_CANONICAL_LEAVES = 256
+
+
+def _rank(signatures):
+    # Replace arbitrary signatures by dense integer colors ordered by signature
+    order = {sig: rank for rank, sig in enumerate(sorted(set(signatures)))}
+    return [order[sig] for sig in signatures]
+
+
+def _refine(colors, mates, matchups_of):
+    # Color refinement: split teams whose division-mates or fixed matchups look different
+    while True:
+        signatures = [
+            (colors[t],
+             tuple(sorted(colors[m] for m in mates[t])),
+             tuple(sorted((week, role, colors[o]) for week, role, o in matchups_of[t])))
+            for t in range(len(colors))
+        ]
+        refined = _rank(signatures)
+        if len(set(refined)) == len(set(colors)):
+            return refined
+        colors = refined
+
+
+def _encode(labels, num_weeks, divisions, matchups):
+    encoded_divisions = sorted(tuple(sorted(labels[t] for t in div)) for div in divisions)
+    encoded_matchups = []
+    for week, a, b, directed in matchups:
+        a, b = labels[a], labels[b]
+        if not directed:
+            a, b = min(a, b), max(a, b)
+        encoded_matchups.append((week, a, b, directed))
+    return (len(labels), num_weeks, encoded_divisions, sorted(encoded_matchups))
+
+
+def _canonical_labeling(num_teams, num_weeks, divisions, matchups):
+    division_of = {t: d for d, div in enumerate(divisions) for t in div}
+    mates = [[m for m in divisions[division_of[t]] if m != t] if t in division_of else []
+             for t in range(num_teams)]
+    matchups_of = [[] for _ in range(num_teams)]
+    for week, a, b, directed in matchups:
+        matchups_of[a].append((week, 'away' if directed else 'either', b))
+        matchups_of[b].append((week, 'home' if directed else 'either', a))
+
+    best = None
+    leaves = 0
+
+    def search(colors):
+        nonlocal best, leaves
+        colors = _refine(colors, mates, matchups_of)
+        cells = {}
+        for t, c in enumerate(colors):
+            cells.setdefault(c, []).append(t)
+        split = next((cells[c] for c in sorted(cells) if len(cells[c]) > 1), None)
+        if split is None:
+            leaves += 1
+            encoding = _encode(colors, num_weeks, divisions, matchups)
+            if best is None or encoding < best[0]:
+                best = (encoding, colors)
+            return
+
+        # Teams without fixed matchups in the same division are interchangeable,
+        # so only one of them needs to be tried
+        candidates, seen_divisions = [], set()
+        for t in split:
+            if not matchups_of[t]:
+                if division_of.get(t) in seen_divisions:
+                    continue
+                seen_divisions.add(division_of.get(t))
+            candidates.append(t)
+
+        for t in candidates:
+            if leaves >= MAX_CANONICAL_LEAVES:
+                return
+            search(_rank([(c, 0 if u == t else 1) for u, c in enumerate(colors)]))
+
+    search([0] * num_teams)
+    return best
+
+
+def canonical_request(teams, num_weeks, use_divisions, division_teams=None, fixed_matchups=None, **options):
+    # Returns (key, labels): key is invariant under renaming teams and reordering divisions
+    # or fixed matchups; labels maps each team name to its canonical label.
+    team_indices = {team: i for i, team in enumerate(teams)}
+
+    divisions = []
+    if use_divisions and division_teams:
+        divisions = [[team_indices[team] for team in division] for division in division_teams]
+
+    matchups = []
+    for matchup in fixed_matchups or []:
+        team1 = team_indices[matchup['team1']]
+        team2 = team_indices[matchup['team2']]
+        if matchup['direction'] == 'team1_away':
+            matchups.append((matchup['week'], team1, team2, True))
+        elif matchup['direction'] == 'team2_away':
+            matchups.append((matchup['week'], team2, team1, True))
+        else:
+            matchups.append((matchup['week'], team1, team2, False))
+
+    encoding, colors = _canonical_labeling(len(teams), num_weeks, divisions, matchups)
+    # The search log only adds metrics, which are not cached
+    options.pop('search_log', None)
+    payload = json.dumps([CACHE_VERSION, encoding, sorted(options.items())])
+    key = hashlib.sha256(payload.encode()).hexdigest()
+    labels = {team: colors[i] for i, team in enumerate(teams)}
+    return key, labels
+
+
+def to_canonical(result, labels):
+    solutions = [{week: [(labels[away], labels[home]) for away, home in games]
+                  for week, games in schedule.items()}
+                 for schedule in result['solutions']]
+    return dict(result, solutions=solutions)
+
+
+def from_canonical(result, labels):
+    teams_by_label = {label: team for team, label in labels.items()}
+    solutions = [{int(week): [(teams_by_label[away], teams_by_label[home]) for away, home in games]
+                  for week, games in schedule.items()}
+                 for schedule in result['solutions']]
+    return dict(result, solutions=solutions)
+
+
+class ScheduleCache:
+    def __init__(self, path, max_memory_entries=128, max_disk_bytes=64 * 1024 * 1024):
+        self.__max_memory_entries = max_memory_entries
+        self.__max_disk_bytes = max_disk_bytes
+        self.__memory = OrderedDict()
+        self.__lock = threading.Lock()
+        self.__memory_hits = 0
+        self.__disk_hits = 0
+        self.__misses = 0
+        self.__db = sqlite3.connect(path, check_same_thread=False)
+        self.__db.execute(
+            'CREATE TABLE IF NOT EXISTS schedules ('
+            'key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, accessed REAL NOT NULL)'
+        )
+        self.__db.execute('CREATE INDEX IF NOT EXISTS schedules_accessed ON schedules (accessed)')
+        self.__db.commit()
+
+    def get(self, key):
+        with self.__lock:
+            if key in self.__memory:
+                self.__memory.move_to_end(key)
+                self.__memory_hits += 1
+                return self.__memory[key]
+
+            row = self.__db.execute('SELECT value FROM schedules WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                self.__misses += 1
+                return None
+            self.__db.execute('UPDATE schedules SET accessed = ? WHERE key = ?', (time.time(), key))
+            self.__db.commit()
+            self.__disk_hits += 1
+            value = json.loads(zlib.decompress(row[0]))
+            self._remember(key, value)
+            return value
+
+    def put(self, key, value):
+        blob = zlib.compress(json.dumps(value).encode())
+        with self.__lock:
+            self._remember(key, value)
+            self.__db.execute('INSERT OR REPLACE INTO schedules VALUES (?, ?, ?, ?)',
+                              (key, blob, len(blob), time.time()))
+            self._evict_disk()
+            self.__db.commit()
+
+    def _remember(self, key, value):
+        self.__memory[key] = value
+        self.__memory.move_to_end(key)
+        while len(self.__memory) > self.__max_memory_entries:
+            self.__memory.popitem(last=False)
+
+    def _evict_disk(self):
+        # Drop least recently used entries until the table fits in the size budget
+        total = self.__db.execute('SELECT COALESCE(SUM(size), 0) FROM schedules').fetchone()[0]
+        if total <= self.__max_disk_bytes:
+            return
+        for key, size in self.__db.execute('SELECT key, size FROM schedules ORDER BY accessed').fetchall():
+            if total <= self.__max_disk_bytes:
+                break
+            self.__db.execute('DELETE FROM schedules WHERE key = ?', (key,))
+            self.__memory.pop(key, None)
+            total -= size
+
+    def stats(self):
+        with self.__lock:
+            lookups = self.__memory_hits + self.__disk_hits + self.__misses
+            disk_entries, disk_bytes = self.__db.execute(
+                'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM schedules').fetchone()
+            return {
+                'memory_hits': self.__memory_hits,
+                'disk_hits': self.__disk_hits,
+                'misses': self.__misses,
+                'hit_rate': (self.__memory_hits + self.__disk_hits) / lookups if lookups else 0.0,
+                'memory_entries': len(self.__memory),
+                'disk_entries': disk_entries,
+                'disk_bytes': disk_bytes,
+            }
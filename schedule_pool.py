@@ -0,0 +1,358 @@
+"""Precompute base schedules for a league shape into the warm-start pool.
+
+Most requests are the same shape (team count, season length, division sizes) with different
+names and a few fixed matchups. The pool keeps valid schedules per shape over base labels;
+a request is relabeled onto them so that its fixed matchups hold, and a schedule that fits is
+returned without solving. Otherwise the closest fit seeds the solver as a hint.
+
+Usage: python schedule_pool.py 10:14:5,5 [12:22:6,6 ...] [--count 20] [--time-limit 60]
+"""
+import argparse
+import logging
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from schedule import Schedule
+from symmetry import distinct_result, symmetry_groups
+
+logger = logging.getLogger(__name__)
+
+# Schedules kept per shape; the pool stops growing once a shape has this many
+MAX_PER_SHAPE = 64
+
+# Search steps allowed for fitting the fixed matchups onto one base schedule
+MAX_FIT_STEPS = 2000
+
+# match() runs in the request: it gives up after MATCH_TIME_LIMIT seconds in total, and is
+# skipped for requests with more fixed matchups than MATCH_MAX_MATCHUPS, which rarely fit
+MATCH_TIME_LIMIT = 0.1
+MATCH_MAX_MATCHUPS = 8
+
+# Solve modes whose results a fitting pool schedule can stand in for
+DIRECT_SOLVE_MODES = ('enumerate', 'decompose')
+
+
+def league_shape(spec):
+    # 'teams:weeks:division sizes', e.g. '10:14:5,5' ('10:14:' without divisions)
+    sizes = sorted(len(division) for division in spec.divisions)
+    return f"{spec.num_teams}:{spec.num_weeks}:{','.join(map(str, sizes))}"
+
+
+def shape_spec(shape):
+    # The league of a shape over base labels: divisions are consecutive blocks, smallest first
+    from league import LeagueSpec
+
+    num_teams, num_weeks, sizes = shape.split(':')
+    teams = [f'T{t}' for t in range(int(num_teams))]
+    divisions, start = [], 0
+    for size in sorted(int(size) for size in sizes.split(',') if size):
+        divisions.append(teams[start:start + size])
+        start += size
+    return LeagueSpec(teams, int(num_weeks), divisions)
+
+
+def base_labels(spec):
+    # Default base label of each team: divisions in shape_spec block order, then the other teams
+    labels = np.full(spec.num_teams, -1)
+    order = sorted(range(len(spec.divisions)), key=lambda d: len(spec.divisions[d]))
+    members = [t for d in order for t in spec.division_indices[d]]
+    in_divisions = set(members)
+    members += [t for t in range(spec.num_teams) if t not in in_divisions]
+    labels[members] = np.arange(spec.num_teams)
+    return labels
+
+
+def to_base(opponents, home, labels):
+    base_opponents = np.empty_like(opponents)
+    base_home = np.empty_like(home)
+    base_opponents[:, labels] = labels[opponents]
+    base_home[:, labels] = home
+    return base_opponents, base_home
+
+
+def from_base(opponents, home, labels):
+    inverse = np.argsort(labels)
+    return inverse[opponents[:, labels]].astype(np.int8), home[:, labels]
+
+
+def _matchups(spec):
+    # Fixed matchups as (0-indexed week, i, j, role of i): 'away' or 'home' when directed
+    matchups = []
+    for matchup in spec.fixed_matchups:
+        i, j = spec.team_indices[matchup['team1']], spec.team_indices[matchup['team2']]
+        role = {'team1_away': 'away', 'team2_away': 'home'}.get(matchup['direction'])
+        matchups.append((matchup['week'] - 1, i, j, role))
+    return matchups
+
+
+class _Fitter:
+    # Backtracking search for base labels under which a base schedule plays the fixed matchups.
+    # Labeling one team of a matchup forces its opponent's label, so each connected group of
+    # fixed matchups is decided by a single choice. Division blocks are kept whole.
+    def __init__(self, spec, base_groups):
+        self.__num_teams = spec.num_teams
+        self.__groups = np.full(spec.num_teams, -1)
+        for d, division in enumerate(spec.division_indices):
+            self.__groups[division] = d
+        self.__base_groups = base_groups
+        self.__sizes = {d: len(division) for d, division in enumerate(spec.divisions)}
+        self.__base_sizes = {g: int((base_groups == g).sum()) for g in set(base_groups.tolist())}
+
+    def fit(self, opponents, home, matchups, deadline=None):
+        # Base labels of every team, or None when the matchups cannot all be played (or the
+        # perf_counter deadline passes first)
+        partners = defaultdict(list)
+        for w, i, j, role in matchups:
+            partners[i].append((w, j, role))
+            partners[j].append((w, i, {'away': 'home', 'home': 'away'}.get(role)))
+        involved = list(partners)
+        steps = 0
+
+        def assign(t, label, state):
+            labels, used, blocks = dict(state[0]), set(state[1]), dict(state[2])
+            stack = [(t, label)]
+            while stack:
+                t, label = stack.pop()
+                if t in labels:
+                    if labels[t] != label:
+                        return None
+                    continue
+                group, block = self.__groups[t], self.__base_groups[label]
+                if label in used or (group == -1) != (block == -1):
+                    return None
+                if group != -1:
+                    if blocks.get(group, block) != block or self.__sizes[group] != self.__base_sizes[block]:
+                        return None
+                    if group not in blocks and block in blocks.values():
+                        return None
+                    blocks[group] = block
+                labels[t] = label
+                used.add(label)
+                for w, u, role in partners[t]:
+                    if (role == 'away' and home[w, label]) or (role == 'home' and not home[w, label]):
+                        return None
+                    stack.append((u, int(opponents[w, label])))
+            return labels, used, blocks
+
+        def search(state):
+            nonlocal steps
+            steps += 1
+            if steps > MAX_FIT_STEPS or (deadline is not None and time.perf_counter() > deadline):
+                return None
+            t = next((t for t in involved if t not in state[0]), None)
+            if t is None:
+                return state
+            for label in range(self.__num_teams):
+                assigned = assign(t, label, state)
+                found = assigned and search(assigned)
+                if found:
+                    return found
+            return None
+
+        state = search(({}, set(), {}))
+        return None if state is None else self._complete(*state)
+
+    def _complete(self, labels, used, blocks):
+        # Remaining divisions take the remaining blocks of their size; remaining teams the free labels
+        blocks = dict(blocks)
+        blocks[-1] = -1
+        for group, size in self.__sizes.items():
+            if group not in blocks:
+                blocks[group] = next(block for block, base_size in self.__base_sizes.items()
+                                     if block != -1 and base_size == size and block not in blocks.values())
+        free = defaultdict(list)
+        for label in range(self.__num_teams):
+            if label not in used:
+                free[self.__base_groups[label]].append(label)
+        for t in range(self.__num_teams):
+            if t not in labels:
+                labels[t] = free[blocks[self.__groups[t]]].pop(0)
+        return np.array([labels[t] for t in range(self.__num_teams)])
+
+
+def variants(schedule):
+    # A schedule, mirrored (home and away swapped) and reversed: all four satisfy the same rules
+    opponents, home = schedule.matrices()
+    for opp, hom in ((opponents, home), (opponents[::-1], home[::-1])):
+        yield opp, hom
+        yield opp, ~hom
+
+
+def match(spec, schedules, num_solutions, time_limit=MATCH_TIME_LIMIT):
+    # Relabel base schedules of spec's shape onto spec. Returns (fitting, hint): the distinct
+    # schedules (up to num_solutions) that play every fixed matchup, and when there are none the
+    # schedule playing the most of them, as Schedules over spec's teams. Stops with what it has
+    # found after time_limit seconds.
+    if not schedules or len(spec.fixed_matchups) > MATCH_MAX_MATCHUPS:
+        return [], None
+    deadline = time.perf_counter() + time_limit
+    base_groups = np.full(spec.num_teams, -1)
+    for g, division in enumerate(shape_spec(league_shape(spec)).division_indices):
+        base_groups[division] = g
+    fitter = _Fitter(spec, base_groups)
+    matchups = _matchups(spec)
+
+    fitting = {}
+    best, best_kept = None, -1
+    for schedule in schedules:
+        if time.perf_counter() > deadline:
+            break
+        for opponents, home in variants(schedule):
+            labels = fitter.fit(opponents, home, matchups, deadline)
+            if labels is not None:
+                fitting.setdefault(Schedule(*from_base(opponents, home, labels), spec.teams), None)
+                if len(fitting) >= num_solutions:
+                    return list(fitting), None
+                continue
+            if fitting:
+                continue
+            # Greedily keep the matchups that can be played together
+            kept, kept_labels = [], None
+            for matchup in matchups:
+                labels = fitter.fit(opponents, home, kept + [matchup], deadline)
+                if labels is not None:
+                    kept, kept_labels = kept + [matchup], labels
+            if len(kept) > best_kept:
+                best_kept = len(kept)
+                best = (opponents, home, kept_labels if kept_labels is not None else fitter.fit(opponents, home, []))
+    if fitting or best is None:
+        return list(fitting), None
+    return [], Schedule(*from_base(*best), spec.teams)
+
+
+def pool_result(spec, schedules, seconds, distinct_count=False):
+    # A solve result for schedules taken from the pool
+    result = {
+        'status': 'FEASIBLE',
+        'solution_count': len(schedules),
+        'warm_start': 'pool',
+        'metrics': {'solve_ms': seconds * 1000, 'solver_status': 'FEASIBLE'},
+        'solutions': [schedule.to_dict() for schedule in schedules],
+    }
+    if distinct_count:
+        symmetry = symmetry_groups(spec.num_teams, spec.division_indices, spec.fixed_matchups, spec.team_indices)
+        result.update(distinct_result([schedule.matrices() for schedule in schedules], symmetry))
+    return result
+
+
+class SchedulePool:
+    def __init__(self, path, max_per_shape=MAX_PER_SHAPE):
+        self.__max_per_shape = max_per_shape
+        self.__lock = threading.Lock()
+        self.__loaded = {}
+        self.__db = sqlite3.connect(path, check_same_thread=False)
+        self.__db.execute(
+            'CREATE TABLE IF NOT EXISTS base_schedules ('
+            'shape TEXT NOT NULL, schedule BLOB NOT NULL, added REAL NOT NULL, PRIMARY KEY (shape, schedule))'
+        )
+        self.__db.commit()
+
+    def schedules(self, shape):
+        # Base schedules of a shape, loaded from disk once
+        with self.__lock:
+            if shape not in self.__loaded:
+                base = shape_spec(shape)
+                rows = self.__db.execute('SELECT schedule FROM base_schedules WHERE shape = ? ORDER BY added',
+                                         (shape,)).fetchall()
+                self.__loaded[shape] = [Schedule.from_bytes(row[0], base.num_weeks, base.num_teams)
+                                        for row in rows]
+            return self.__loaded[shape]
+
+    def add(self, spec, schedules):
+        # Store solved schedules (dicts over spec's teams) under spec's shape; returns how many were new
+        shape = league_shape(spec)
+        labels = base_labels(spec)
+        known = set(self.schedules(shape))
+        added = 0
+        with self.__lock:
+            for schedule in schedules:
+                if len(known) >= self.__max_per_shape:
+                    break
+                opponents, home = Schedule.from_dict(schedule, spec.teams, spec.num_weeks).matrices()
+                base = Schedule(*to_base(opponents, home, labels))
+                if base in known:
+                    continue
+                known.add(base)
+                self.__db.execute('INSERT OR IGNORE INTO base_schedules VALUES (?, ?, ?)',
+                                  (shape, base.to_bytes(), time.time()))
+                added += 1
+            self.__db.commit()
+            self.__loaded.pop(shape, None)
+        return added
+
+    def match(self, spec, num_solutions):
+        return match(spec, self.schedules(league_shape(spec)), num_solutions)
+
+    def stats(self):
+        with self.__lock:
+            return dict(self.__db.execute('SELECT shape, COUNT(*) FROM base_schedules GROUP BY shape').fetchall())
+
+
+def solve_shape(shape, count, time_limit, num_workers=None):
+    # `count` diverse schedules of a shape, as a solve result over shape_spec's teams
+    from league import solve
+
+    return solve(shape_spec(shape), solve_mode='diverse', num_solutions=count, time_limit=time_limit,
+                 num_workers=num_workers)
+
+
+def build(pool, shape, count, time_limit):
+    # Solve `count` diverse schedules of a shape in this process and add them to the pool
+    result = solve_shape(shape, count, time_limit)
+    return result['status'], pool.add(shape_spec(shape), result['solutions'])
+
+
+def _lowest_priority():
+    # Warm-up process initializer: yield the CPU to request solves
+    if hasattr(os, 'nice'):
+        os.nice(19)
+
+
+def warm(pool, shapes, count, time_limit):
+    # Fill the shapes that hold fewer than `count` schedules from a background thread. Shapes are
+    # solved one at a time, single-threaded, in one lowest-priority process of their own rather
+    # than in the web app's job pool. Returns the thread, or None when every shape is full.
+    stats = pool.stats()
+    shapes = [shape for shape in shapes if stats.get(shape, 0) < count]
+    if not shapes:
+        return None
+
+    def run():
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn'),
+                                 initializer=_lowest_priority) as executor:
+            for shape in shapes:
+                try:
+                    result = executor.submit(solve_shape, shape, count, time_limit, 1).result()
+                    pool.add(shape_spec(shape), result['solutions'])
+                except Exception:
+                    logger.exception('Pool warm-up failed for shape %s', shape)
+
+    thread = threading.Thread(target=run, name='schedule-pool-warm-up', daemon=True)
+    thread.start()
+    return thread
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('shapes', nargs='+', metavar='TEAMS:WEEKS:DIVISION_SIZES')
+    parser.add_argument('--count', type=int, default=20, help='schedules to solve per shape')
+    parser.add_argument('--time-limit', type=float, default=60.0, help='solve budget per shape in seconds')
+    parser.add_argument('--path', default=os.environ.get(
+        'SCHEDULER_POOL_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'schedule_pool.sqlite3')))
+    args = parser.parse_args(argv)
+
+    pool = SchedulePool(args.path)
+    for shape in args.shapes:
+        status, added = build(pool, shape, args.count, args.time_limit)
+        print(f'{shape}: {status}, {added} new schedule(s), {pool.stats().get(shape, 0)} in the pool')
+
+
+if __name__ == '__main__':
+    main()
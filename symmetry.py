@@ -0,0 +1,120 @@
+import itertools
+import math
+
+import numpy as np
+
+# Relabelings tried per week order and mirror image when counting distinct schedules. Every
+# choice of reference team in every group is one relabeling, so there are the product of the
+# group sizes in all (10^4 for four divisions of ten).
+MAX_RELABELINGS = 64
+
+
+def symmetry_groups(num_teams, divisions, fixed_matchups, team_indices):
+    # Symmetries of the scheduling model that survive the user's fixed matchups:
+    # - 'teams': sets of interchangeable teams (same division, no fixed matchups)
+    # - 'reverse_weeks': playing the season backwards (only without fixed matchups)
+    # - 'mirror': swapping home and away in every game (only without directed fixed matchups)
+    touched = set()
+    directed = False
+    for matchup in fixed_matchups or []:
+        touched.add(team_indices[matchup['team1']])
+        touched.add(team_indices[matchup['team2']])
+        directed = directed or matchup['direction'] != 'either'
+
+    candidates = divisions if divisions else [range(num_teams)]
+    teams = [sorted(t for t in div if t not in touched) for div in candidates]
+    return {
+        'teams': [group for group in teams if len(group) >= 2],
+        'reverse_weeks': not fixed_matchups,
+        'mirror': not directed,
+    }
+
+
+def add_symmetry_breaking(model, num_weeks, symmetry, meet_literals, home_literals):
+    # meet_literals(w, i, j): literals whose disjunction means i and j meet in week w
+    # home_literals(w, t): literals whose disjunction means t is at home in week w
+    for group in symmetry['teams']:
+        # The first team of each group meets the others for the first time in label order:
+        # whenever it meets group[k + 1], it must already have met group[k] in an earlier week
+        ref, rest = group[0], group[1:]
+        for a, b in zip(rest, rest[1:]):
+            for w in range(num_weeks):
+                earlier = [lit for v in range(w) for lit in meet_literals(v, ref, a)]
+                for lit in meet_literals(w, ref, b):
+                    model.AddBoolOr([lit.Not()] + earlier)
+
+    if symmetry['reverse_weeks'] and symmetry['teams']:
+        # Of a schedule and its reverse, keep the one where the first group's reference team
+        # meets the rest of its group no later from the start than from the end of the season
+        ref, rest = symmetry['teams'][0][0], symmetry['teams'][0][1:]
+        for d in range((num_weeks - 1) // 2 + 1):
+            late = num_weeks - 1 - d
+            if late <= d:
+                break
+            early = [lit for u in range(d + 1) for s in rest for lit in meet_literals(u, ref, s)]
+            for s in rest:
+                for lit in meet_literals(late, ref, s):
+                    model.AddBoolOr([lit.Not()] + early)
+
+    if symmetry['mirror']:
+        # Of a schedule and its home/away mirror image, keep the one where team 0 hosts week 1
+        model.AddBoolOr(home_literals(0, 0))
+
+
+def _group_orders(opp, home, group, num_weeks):
+    # For each choice of reference team, the group's teams in relabeling order: the reference
+    # first, then the others by their first meeting with it. Ties (teams it never meets) are
+    # broken by structure, not by label: their own home pattern, then the weeks in which they
+    # first meet the rest of the group.
+    met = opp[:, None, :] == np.asarray(group)[None, :, None]
+    first = np.where(met.any(axis=0), met.argmax(axis=0), num_weeks)
+    signature = {t: (np.packbits(home[:, t]).tobytes(), tuple(sorted(first[:, t]))) for t in group}
+    return [[ref] + sorted((t for t in group if t != ref), key=lambda t: (first[k, t], signature[t]))
+            for k, ref in enumerate(group)]
+
+
+def canonical_schedule(opponents, home, symmetry, max_relabelings=None):
+    # Smallest encoding of the schedule over its symmetric images, so two schedules have the
+    # same canonical form exactly when they are relabelings/mirrors of each other. Trying
+    # every reference team costs the product of the group sizes per week order and mirror;
+    # with max_relabelings only that many are tried. Returns (encoding, exact).
+    num_weeks, num_teams = opponents.shape
+    best = None
+    exact = True
+    for reverse in ([False, True] if symmetry['reverse_weeks'] else [False]):
+        opp = opponents[::-1] if reverse else opponents
+        hom = home[::-1] if reverse else home
+        for flip in ([False, True] if symmetry['mirror'] else [False]):
+            flipped = ~hom if flip else hom
+            orders = [_group_orders(opp, flipped, group, num_weeks) for group in symmetry['teams']]
+            choices = itertools.product(*orders)
+            if max_relabelings is not None and math.prod(map(len, orders)) > max_relabelings:
+                choices = itertools.islice(choices, max_relabelings)
+                exact = False
+            for choice in choices:
+                perm = np.arange(num_teams)
+                for group, order in zip(symmetry['teams'], choice):
+                    perm[order] = group
+                relabeled_opp = np.empty_like(opp)
+                relabeled_opp[:, perm] = perm[opp]
+                relabeled_home = np.empty_like(flipped)
+                relabeled_home[:, perm] = flipped
+                key = relabeled_opp.tobytes() + np.packbits(relabeled_home).tobytes()
+                if best is None or key < best:
+                    best = key
+    return best, exact
+
+
+def count_distinct(solutions, symmetry, max_relabelings=MAX_RELABELINGS):
+    # (count, exact): schedules that differ beyond the symmetries. When a schedule's
+    # relabelings were capped, equivalent schedules may be told apart, so the count is then
+    # an upper bound.
+    canonical = [canonical_schedule(opponents, home, symmetry, max_relabelings) for opponents, home in solutions]
+    return len({key for key, _ in canonical}), all(exact for _, exact in canonical)
+
+
+def distinct_result(solutions, symmetry):
+    # The distinct_count of a solve result, with distinct_count_exact: False when it is only
+    # an upper bound
+    count, exact = count_distinct(solutions, symmetry)
+    return {'distinct_count': count} if exact else {'distinct_count': count, 'distinct_count_exact': False}
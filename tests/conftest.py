@@ -0,0 +1,36 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# The web app opens its cache and pool at import-time paths; keep tests away from the real files
+_STATE = tempfile.mkdtemp(prefix='csp-scheduler-tests-')
+os.environ.setdefault('SCHEDULER_CACHE_PATH', os.path.join(_STATE, 'cache.sqlite3'))
+os.environ.setdefault('SCHEDULER_POOL_PATH', os.path.join(_STATE, 'pool.sqlite3'))
+os.environ['SCHEDULER_POOL_SHAPES'] = ''
+
+import league  # noqa: E402
+
+TEAMS = ['A', 'B', 'C', 'D', 'E', 'F']
+
+
+@pytest.fixture(scope='session')
+def round_robin():
+    # A 6-team single round-robin (5 weeks) and a few of its schedules
+    spec = league.LeagueSpec.from_request(TEAMS, 5, False)
+    result = league.solve(spec, num_solutions=3, time_limit=30, compact=True)
+    assert result['solution_count'] == 3
+    return spec, result['solutions']
+
+
+@pytest.fixture(scope='session')
+def double_round_robin():
+    # A 6-team double round-robin (10 weeks), long enough for rematches
+    spec = league.LeagueSpec.from_request(TEAMS, 10, False)
+    result = league.solve(spec, num_solutions=1, time_limit=30, compact=True)
+    assert result['solution_count'] == 1
+    return spec, result['solutions'][0]
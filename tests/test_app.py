@@ -0,0 +1,62 @@
+import pytest
+
+import app
+
+TEAMS = ['A', 'B', 'C', 'D', 'E', 'F']
+
+
+@pytest.fixture
+def client():
+    return app.app.test_client()
+
+
+def body(**changes):
+    return dict({'teams': TEAMS, 'num_weeks': 5, 'use_divisions': False, 'fixed_matchups': []}, **changes)
+
+
+@pytest.mark.parametrize('changes, message', [
+    ({'teams': TEAMS[:5]}, 'Number of teams must be even'),
+    ({'num_weeks': 3}, 'Season too short'),
+    ({'num_weeks': 'five'}, 'num_weeks must be an integer'),
+    ({'num_weeks': None}, 'num_weeks is required'),
+    ({'solve_mode': 'fastest'}, 'Unknown solve mode'),
+    ({'solve_mode': 'optimize', 'objective': 'nothing'}, 'nothing'),
+    ({'time_limit': -1}, 'time_limit must be at least'),
+    ({'seeds': [-1]}, 'seed'),
+    ({'model_backend': 'matrix'}, 'Unknown model backend'),
+    ({'fixed_matchups': [{'week': '3', 'team1': 'A', 'team2': 'B', 'direction': 'either'}]},
+     'must be an integer'),
+    ({'fixed_matchups': [{'week': 1, 'team1': 'A', 'team2': 'Z', 'direction': 'either'}]}, 'Unknown team'),
+])
+def test_malformed_requests_get_400(client, changes, message):
+    response = client.post('/generate', json=body(**changes))
+    assert response.status_code == 400
+    assert response.get_json()['status'] == 'ERROR'
+    assert message in response.get_json()['message']
+
+
+def test_infeasible_requests_get_422(client):
+    fixed = [{'week': 1, 'team1': 'A', 'team2': 'B', 'direction': 'either'},
+             {'week': 1, 'team1': 'A', 'team2': 'C', 'direction': 'either'}]
+    response = client.post('/generate', json=body(fixed_matchups=fixed))
+    assert response.status_code == 422
+    result = response.get_json()
+    assert result['status'] == 'INFEASIBLE' and result['conflicts']
+
+
+@pytest.mark.parametrize('changes, message', [
+    ({'num_weeks': 'x'}, 'num_weeks must be an integer'),
+    ({'time_limit': 'soon'}, 'time_limit must be a number'),
+    ({'locked_weeks': ['1']}, 'locked_weeks'),
+    ({'previous': {1: [['Z', 'A']]}}, 'Unknown team in previous schedule: Z'),
+    ({'previous': [['A', 'B']]}, 'previous must map weeks'),
+])
+def test_malformed_replans_get_400(client, changes, message):
+    response = client.post('/replan', json=dict(body(previous={}, locked_weeks=[]), **changes))
+    assert response.status_code == 400
+    assert message in response.get_json()['message']
+
+
+def test_validate_reports_unknown_teams(client):
+    response = client.post('/validate', json=body(schedule={1: [['A', 'Z']]}))
+    assert response.status_code == 400
@@ -0,0 +1,57 @@
+import time
+
+import numpy as np
+import pytest
+
+import decompose
+import league
+from decompose import timetables
+from validation import validate_schedule
+
+
+@pytest.fixture
+def pair_models(monkeypatch):
+    # Timetables already tried (the `excluded` argument) each time the pair model is built
+    built = []
+    pair_model = decompose._pair_model
+
+    def spy(num_teams, num_weeks, divisions, fixed_pairs, excluded=()):
+        built.append(len(excluded))
+        return pair_model(num_teams, num_weeks, divisions, fixed_pairs, excluded)
+
+    monkeypatch.setattr(decompose, '_pair_model', spy)
+    return built
+
+
+def is_timetable(opponents):
+    num_weeks, num_teams = opponents.shape
+    teams = np.arange(num_teams)
+    return all((opponents[w][opponents[w]] == teams).all() and (opponents[w] != teams).all()
+               for w in range(num_weeks))
+
+
+def test_pair_model_continues_after_the_round_pattern_runs_out(pair_models):
+    # 4 teams over 3 weeks: the round pattern yields every order of its 3 rounds, after which the
+    # pair model is still tried (with those timetables cut off) before giving up
+    found = list(timetables(4, 3, [], [], time.perf_counter() + 30))
+    assert len(found) == 6
+    assert len({opponents.tobytes() for opponents in found}) == 6
+    assert all(is_timetable(opponents) for opponents in found)
+    assert pair_models == [6]
+
+
+def test_fixed_matchups_the_round_pattern_cannot_place_use_the_pair_model(pair_models):
+    fixed = [(0, 0, 1), (0, 2, 3), (1, 0, 2), (1, 1, 4)]
+    first = next(timetables(6, 5, [], fixed, time.perf_counter() + 30))
+    assert pair_models == [0]
+    assert is_timetable(first)
+    assert all(first[w, i] == j for w, i, j in fixed)
+
+
+def test_decomposed_schedules_are_valid():
+    teams = [f'T{t}' for t in range(16)]
+    spec = league.LeagueSpec.from_request(teams, 15, False)
+    result = league.solve(spec, solve_mode='decompose', num_solutions=2, time_limit=30, compact=True)
+    assert result['status'] in ('OPTIMAL', 'FEASIBLE') and result['solution_count'] == 2
+    for schedule in result['solutions']:
+        assert validate_schedule(spec, schedule)['valid']
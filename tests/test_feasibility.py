@@ -0,0 +1,56 @@
+import pytest
+
+from feasibility import find_conflicts, input_errors
+
+TEAMS = ['A', 'B', 'C', 'D', 'E', 'F', 'G', 'H']
+
+
+def matchup(week, team1, team2, direction='either'):
+    return {'week': week, 'team1': team1, 'team2': team2, 'direction': direction}
+
+
+def conflicts(fixed, num_weeks=7, divisions=()):
+    index = {team: i for i, team in enumerate(TEAMS)}
+    return find_conflicts(TEAMS, num_weeks, [[index[t] for t in d] for d in divisions], fixed)
+
+
+@pytest.mark.parametrize('fixed, message', [
+    ([matchup(1, 'A', 'Z')], 'Unknown team in fixed matchup: Z'),
+    ([matchup(1, 'A', 'A')], 'A cannot play itself'),
+    ([matchup(8, 'A', 'B')], 'must be between 1 and 7'),
+    ([matchup('3', 'A', 'B')], "must be an integer: A vs B (week '3')"),
+    ([matchup(True, 'A', 'B')], 'must be an integer'),
+    ([matchup(1, 'A', 'B', 'home')], "Unknown direction 'home'"),
+    ([{'week': 1, 'team1': 'A'}], 'need team1, team2, week and direction'),
+])
+def test_malformed_fixed_matchups(fixed, message):
+    errors = input_errors(TEAMS, 7, False, None, fixed)
+    assert any(message in error for error in errors), errors
+
+
+def test_division_errors():
+    errors = input_errors(TEAMS, 14, True, [['A', 'B', 'Z'], ['B', 'C']], [])
+    assert 'Unknown team in divisions: Z' in errors
+    assert 'B is in more than one division' in errors
+
+
+def test_well_formed_request_has_no_errors_or_conflicts():
+    fixed = [matchup(1, 'A', 'B'), matchup(2, 'C', 'D', 'team1_away')]
+    assert input_errors(TEAMS, 7, False, None, fixed) == []
+    assert conflicts(fixed) == []
+
+
+def test_team_in_two_matchups_of_one_week_conflicts():
+    found = conflicts([matchup(1, 'A', 'B'), matchup(1, 'A', 'C')])
+    assert found and len(found[0]['fixed_matchups']) == 2
+
+
+def test_rematch_within_the_gap_conflicts():
+    assert conflicts([matchup(1, 'A', 'B'), matchup(3, 'B', 'A')], num_weeks=14)
+
+
+def test_team_outside_every_division_is_unconstrained():
+    divisions = [['A', 'B', 'C'], ['D', 'E', 'F']]
+    # G and H are in no division, so they may meet any number of times
+    fixed = [matchup(1, 'G', 'H', 'team1_away'), matchup(8, 'G', 'H', 'team1_away')]
+    assert all('G' not in str(c['fixed_matchups']) for c in conflicts(fixed, 14, divisions))
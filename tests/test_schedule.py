@@ -0,0 +1,86 @@
+import csv
+import datetime
+import io
+
+import numpy as np
+import pytest
+
+from schedule import Schedule, export, read_binary, read_ndjson, schedule_from_dict, schedule_to_dict
+
+
+def test_dict_round_trip(round_robin):
+    spec, schedules = round_robin
+    for schedule in schedules:
+        assert Schedule.from_dict(schedule.to_dict(), spec.teams, spec.num_weeks) == schedule
+        opponents, home = schedule_from_dict(schedule_to_dict(*schedule.matrices(), spec.teams), spec.teams,
+                                             spec.num_weeks)
+        assert (opponents == schedule.opponents).all() and (home == schedule.home).all()
+
+
+def test_bytes_round_trip(round_robin):
+    spec, schedules = round_robin
+    for schedule in schedules:
+        assert Schedule.from_bytes(schedule.to_bytes(), spec.num_weeks, spec.num_teams, spec.teams) == schedule
+
+
+@pytest.mark.parametrize('fmt, read', [('bin', read_binary), ('ndjson', read_ndjson)])
+def test_bulk_export_round_trip(round_robin, fmt, read):
+    _, schedules = round_robin
+    f = io.BytesIO() if fmt == 'bin' else io.StringIO()
+    export(schedules, fmt, f)
+    f.seek(0)
+    assert read(f) == list(schedules)
+
+
+def test_bulk_export_of_nothing_reads_back_empty():
+    for f, read in ((io.BytesIO(), read_binary), (io.StringIO(), read_ndjson)):
+        export([], 'bin' if read is read_binary else 'ndjson', f)
+        f.seek(0)
+        assert read(f) == []
+
+
+def test_truncated_binary_export_is_rejected(round_robin):
+    _, schedules = round_robin
+    f = io.BytesIO()
+    export(schedules, 'bin', f)
+    with pytest.raises(ValueError):
+        read_binary(io.BytesIO(f.getvalue()[:-1]))
+
+
+def test_csv_lists_every_game(round_robin):
+    spec, schedules = round_robin
+    f = io.StringIO(newline='')
+    export(schedules, 'csv', f)
+    rows = list(csv.DictReader(io.StringIO(f.getvalue())))
+    assert len(rows) == len(schedules) * spec.num_weeks * spec.num_teams // 2
+    for index, schedule in enumerate(schedules, 1):
+        games = {(int(row['week']), row['visitor'], row['home']) for row in rows if row['schedule'] == str(index)}
+        assert games == set(schedule.games())
+        rebuilt = {}
+        for week, visitor, host in games:
+            rebuilt.setdefault(week, []).append([visitor, host])
+        assert Schedule.from_dict(rebuilt, spec.teams, spec.num_weeks) == schedule
+
+
+def test_ics_has_one_event_per_game_on_its_week(round_robin):
+    spec, schedules = round_robin
+    f = io.StringIO(newline='')
+    export(schedules, 'ics', f, season_start=datetime.date(2026, 9, 6))
+    text = f.getvalue()
+    assert text.startswith('BEGIN:VCALENDAR\r\n') and text.endswith('END:VCALENDAR\r\n')
+    events = text.split('BEGIN:VEVENT')[1:]
+    assert len(events) == spec.num_weeks * spec.num_teams // 2
+    summaries = {line[len('SUMMARY:'):] for event in events for line in event.split('\r\n')
+                 if line.startswith('SUMMARY:')}
+    assert summaries == {f'{visitor} at {host}' for _, visitor, host in schedules[0].games()}
+    assert 'DTSTART;VALUE=DATE:20260913' in text  # week 2
+
+
+def test_changed_games_counts_games_not_played_again(round_robin):
+    _, schedules = round_robin
+    schedule = schedules[0]
+    assert schedule.changed_games(schedule) == 0
+    opponents, home = schedule.matrices()
+    mirrored = Schedule(opponents, ~home)
+    # Every game is now hosted by its former visitor
+    assert mirrored.changed_games(schedule) == np.count_nonzero(home)
@@ -0,0 +1,48 @@
+from schedule_cache import canonical_request, from_canonical, to_canonical
+
+TEAMS = ['A', 'B', 'C', 'D', 'E', 'F', 'G', 'H']
+DIVISIONS = [['A', 'B', 'C', 'D'], ['E', 'F', 'G', 'H']]
+MATCHUPS = [
+    {'week': 1, 'team1': 'A', 'team2': 'E', 'direction': 'team1_away'},
+    {'week': 3, 'team1': 'B', 'team2': 'C', 'direction': 'either'},
+]
+
+
+def key(teams=TEAMS, divisions=DIVISIONS, matchups=MATCHUPS, **options):
+    return canonical_request(teams, 14, True, divisions, matchups, **options)
+
+
+def test_key_ignores_team_names():
+    names = dict(zip(TEAMS, ['u', 'v', 'w', 'x', 'y', 'z', 'q', 'r']))
+    renamed = key([names[t] for t in TEAMS], [[names[t] for t in d] for d in DIVISIONS],
+                  [dict(m, team1=names[m['team1']], team2=names[m['team2']]) for m in MATCHUPS])
+    assert renamed[0] == key()[0]
+
+
+def test_key_ignores_team_division_and_matchup_order():
+    reordered = key(TEAMS[::-1], [division[::-1] for division in DIVISIONS[::-1]], MATCHUPS[::-1])
+    assert reordered[0] == key()[0]
+
+
+def test_key_ignores_reversed_direction_of_the_same_game():
+    flipped = [dict(MATCHUPS[0], team1='E', team2='A', direction='team2_away'), MATCHUPS[1]]
+    assert key(matchups=flipped)[0] == key()[0]
+
+
+def test_key_tells_apart_different_leagues():
+    base = key()[0]
+    assert key(matchups=[dict(MATCHUPS[0], week=2), MATCHUPS[1]])[0] != base
+    assert key(matchups=[dict(MATCHUPS[0], direction='either'), MATCHUPS[1]])[0] != base
+    # Same teams in the matchup, but now within a division
+    assert key(matchups=[dict(MATCHUPS[0], team2='D'), MATCHUPS[1]])[0] != base
+    assert key(num_solutions=10)[0] != base
+
+
+def test_canonical_results_relabel_onto_renamed_teams():
+    result = {'status': 'FEASIBLE', 'solutions': [{1: [('A', 'E'), ('B', 'F')]}]}
+    _, labels = key()
+    names = dict(zip(TEAMS, ['u', 'v', 'w', 'x', 'y', 'z', 'q', 'r']))
+    _, renamed_labels = key([names[t] for t in TEAMS], [[names[t] for t in d] for d in DIVISIONS],
+                            [dict(m, team1=names[m['team1']], team2=names[m['team2']]) for m in MATCHUPS])
+    relabeled = from_canonical(to_canonical(result, labels), renamed_labels)
+    assert relabeled['solutions'] == [{1: [('u', 'y'), ('v', 'z')]}]
@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+import league
+from schedule_pool import MATCH_MAX_MATCHUPS, base_labels, league_shape, match, shape_spec
+from validation import validate_schedule
+
+TEAMS = ['Ann', 'Bob', 'Cal', 'Dee', 'Eve', 'Fay', 'Gus', 'Hal']
+# Listed in a different order than the base shape's blocks
+DIVISIONS = [['Eve', 'Bob', 'Hal', 'Ann'], ['Cal', 'Gus', 'Dee', 'Fay']]
+
+
+@pytest.fixture(scope='module')
+def base_schedules():
+    spec = league.LeagueSpec.from_request(TEAMS, 10, True, DIVISIONS)
+    base = shape_spec(league_shape(spec))
+    result = league.solve(base, solve_mode='diverse', num_solutions=3, time_limit=30, compact=True)
+    assert result['solution_count'] >= 1
+    return result['solutions']
+
+
+def request(fixed_matchups):
+    return league.LeagueSpec.from_request(TEAMS, 10, True, DIVISIONS, fixed_matchups)
+
+
+def base_game(spec, schedule, week):
+    # A game of a base schedule in `week` (1-indexed), named with the request's teams under the
+    # default relabeling, so that at least that relabeling plays it
+    labels = base_labels(spec)
+    opponents, home = schedule.matrices()
+    visitor = int(np.flatnonzero(~home[week - 1])[0])
+    host = int(opponents[week - 1, visitor])
+    team = {int(label): spec.teams[t] for t, label in enumerate(labels)}
+    return {'week': week, 'team1': team[visitor], 'team2': team[host], 'direction': 'team1_away'}
+
+
+def test_relabeled_schedules_are_valid_and_play_the_fixed_matchups(base_schedules):
+    plain = request([])
+    fixed = [base_game(plain, base_schedules[0], 2), base_game(plain, base_schedules[0], 7)]
+    spec = request(fixed)
+    fitting, hint = match(spec, base_schedules, 10, time_limit=5.0)
+    assert fitting and hint is None
+    for schedule in fitting:
+        assert schedule.teams == tuple(TEAMS)
+        report = validate_schedule(spec, schedule)
+        assert report['valid'], report['violations']
+
+
+def test_without_fixed_matchups_every_base_schedule_fits(base_schedules):
+    fitting, _ = match(request([]), base_schedules, 50, time_limit=5.0)
+    assert len(fitting) >= len(base_schedules)
+    assert all(validate_schedule(request([]), schedule)['valid'] for schedule in fitting)
+
+
+def test_unplayable_matchups_give_a_valid_hint(base_schedules):
+    # Ann cannot play two teams in the same week
+    fixed = [{'week': 1, 'team1': 'Ann', 'team2': 'Bob', 'direction': 'either'},
+             {'week': 1, 'team1': 'Ann', 'team2': 'Eve', 'direction': 'either'}]
+    spec = request(fixed)
+    fitting, hint = match(spec, base_schedules, 10, time_limit=5.0)
+    assert fitting == []
+    report = validate_schedule(spec, hint)
+    assert set(rule for rule, count in report['violation_counts'].items() if count) == {'fixed_matchups'}
+    assert report['violation_counts']['fixed_matchups'] == 1
+
+
+def test_many_fixed_matchups_skip_the_pool(base_schedules):
+    fixed = [{'week': w + 1, 'team1': 'Ann', 'team2': 'Bob', 'direction': 'either'}
+             for w in range(MATCH_MAX_MATCHUPS + 1)]
+    assert match(request(fixed), base_schedules, 10) == ([], None)
@@ -0,0 +1,39 @@
+import numpy as np
+
+from symmetry import count_distinct, symmetry_groups
+
+
+def relabel(opponents, home, perm):
+    # The same schedule with team t renamed to perm[t]
+    relabeled_opponents = np.empty_like(opponents)
+    relabeled_opponents[:, perm] = perm[opponents]
+    relabeled_home = np.empty_like(home)
+    relabeled_home[:, perm] = home
+    return relabeled_opponents, relabeled_home
+
+
+def test_relabeled_mirrored_and_reversed_copies_count_once(round_robin):
+    spec, schedules = round_robin
+    symmetry = symmetry_groups(spec.num_teams, [], [], spec.team_indices)
+    opponents, home = schedules[0].matrices()
+    rng = np.random.default_rng(0)
+    copies = [(opponents, home), (opponents, ~home), (opponents[::-1], home[::-1])]
+    copies += [relabel(opponents, home, rng.permutation(spec.num_teams)) for _ in range(5)]
+    assert count_distinct(copies, symmetry) == (1, True)
+
+
+def test_different_schedules_stay_apart(round_robin):
+    spec, schedules = round_robin
+    symmetry = {'teams': [], 'reverse_weeks': False, 'mirror': False}
+    count, exact = count_distinct([schedule.matrices() for schedule in schedules], symmetry)
+    assert count == len(schedules) and exact
+
+
+def test_capped_relabelings_give_an_upper_bound(round_robin):
+    spec, schedules = round_robin
+    symmetry = symmetry_groups(spec.num_teams, [], [], spec.team_indices)
+    opponents, home = schedules[0].matrices()
+    copies = [relabel(opponents, home, perm) for perm in np.random.default_rng(1).permuted(
+        np.tile(np.arange(spec.num_teams), (6, 1)), axis=1)]
+    count, exact = count_distinct(copies, symmetry, max_relabelings=1)
+    assert not exact and 1 <= count <= len(copies)
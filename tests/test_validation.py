@@ -0,0 +1,95 @@
+import numpy as np
+import pytest
+
+import league
+from validation import VALIDATION_RULES, validate_schedule, validate_schedules
+
+
+def rules(report):
+    return {rule for rule, count in report['violation_counts'].items() if count}
+
+
+def test_solved_schedules_are_valid(round_robin, double_round_robin):
+    spec, schedules = round_robin
+    for schedule in schedules:
+        report = validate_schedule(spec, schedule)
+        assert report['valid'] and report['violations'] == []
+        assert set(report['violation_counts']) == set(VALIDATION_RULES)
+    spec, schedule = double_round_robin
+    assert validate_schedule(spec, schedule.to_dict())['valid']
+
+
+def test_two_home_teams_break_one_game_per_week(round_robin):
+    spec, schedules = round_robin
+    opponents, home = schedules[0].matrices()
+    home = home.copy()
+    visitor = int(np.flatnonzero(~home[0])[0])
+    home[0, visitor] = True
+    report = validate_schedule(spec, (opponents, home))
+    assert 'one_game_per_week' in rules(report)
+    [violation] = [v for v in report['violations'] if v['rule'] == 'one_game_per_week']
+    assert violation['week'] == 1 and 'both home' in violation['reason']
+
+
+def test_missing_game_breaks_one_game_per_week(round_robin):
+    spec, schedules = round_robin
+    schedule = schedules[0].to_dict()
+    schedule[2] = schedule[2][1:]
+    assert 'one_game_per_week' in rules(validate_schedule(spec, schedule))
+
+
+def test_repeated_week_breaks_rematch_gap_and_round_robin(double_round_robin):
+    spec, schedule = double_round_robin
+    opponents, home = schedule.matrices()
+    opponents, home = opponents.copy(), home.copy()
+    opponents[1], home[1] = opponents[0], ~home[0]
+    report = validate_schedule(spec, (opponents, home))
+    assert {'rematch_gap', 'round_robin'} <= rules(report)
+    assert any(v['weeks'] == [1, 2] for v in report['violations'] if v['rule'] == 'rematch_gap')
+
+
+def test_three_home_games_in_a_row_break_no_three_streak(round_robin):
+    spec, schedules = round_robin
+    opponents, home = schedules[0].matrices()
+    home = home.copy()
+    # Team 0 hosts its first three games; each game keeps exactly one home team
+    for w in range(3):
+        home[w, 0], home[w, opponents[w, 0]] = True, False
+    report = validate_schedule(spec, (opponents, home))
+    assert rules(report) - {'home_away_balance'} == {'no_three_streak'}
+    assert any(v['teams'] == ['A'] and v.get('weeks') == [1, 3] for v in report['violations'])
+
+
+def test_unplayed_fixed_matchup_is_reported(round_robin):
+    spec, schedules = round_robin
+    opponents, home = schedules[0].matrices()
+    visitor = int(np.flatnonzero(~home[0])[0])
+    host = spec.teams[opponents[0, visitor]]
+    played = {'week': 1, 'team1': spec.teams[visitor], 'team2': host, 'direction': 'team1_away'}
+    reversed_venue = dict(played, direction='team2_away')
+    fixed = league.LeagueSpec.from_request(spec.teams, spec.num_weeks, False, None, [played, reversed_venue])
+    report = validate_schedule(fixed, schedules[0])
+    assert report['violation_counts']['fixed_matchups'] == 1
+    assert report['violations'][0]['fixed_matchup'] == reversed_venue
+
+
+def test_unknown_team_is_a_value_error(round_robin):
+    spec, schedules = round_robin
+    schedule = schedules[0].to_dict()
+    schedule[1] = [['Z', schedule[1][0][1]]] + schedule[1][1:]
+    with pytest.raises(ValueError, match='Unknown team'):
+        validate_schedule(spec, schedule)
+
+
+def test_batch_counts_match_single_reports(double_round_robin):
+    spec, schedule = double_round_robin
+    opponents, home = schedule.matrices()
+    broken_opponents, broken_home = opponents.copy(), home.copy()
+    broken_opponents[1], broken_home[1] = opponents[0], ~home[0]
+    stacks = np.stack([opponents, broken_opponents]), np.stack([home, broken_home])
+    counts = validate_schedules(spec, *stacks)
+    for k, pair in enumerate(zip(*stacks)):
+        single = validate_schedule(spec, pair)['violation_counts']
+        for rule in VALIDATION_RULES:
+            assert bool(counts[rule][k]) == bool(single[rule])
+    assert not any(counts[rule][0] for rule in VALIDATION_RULES)
@@ -0,0 +1,180 @@
+import numpy as np
+
+from feasibility import REMATCH_GAP, describe
+from schedule import Schedule, schedule_from_dict
+
+# Checks a finished schedule against every league rule with array operations over week x team
+# opponent/home matrices. Rules are named as in league.RULES. validate_schedules audits a stack
+# of schedules of one league at once; validate_schedule explains the violations of one.
+
+VALIDATION_RULES = ('one_game_per_week', 'home_away_balance', 'no_three_streak', 'rematch_gap',
+                    'round_robin', 'fixed_matchups')
+
+
+def _pair_rules(spec):
+    # Per pair of teams: fewest and most meetings, and whether two meetings must be one home
+    # game each (divisional pairs, and every pair without divisions). Pairs with a team outside
+    # the divisions are unconstrained.
+    n, num_weeks = spec.num_teams, spec.num_weeks
+    fewest = np.zeros((n, n), dtype=int)
+    most = np.full((n, n), num_weeks)
+    swap = np.zeros((n, n), dtype=bool)
+    if not spec.divisions:
+        fewest[:], most[:], swap[:] = 1, 2, True
+        return fewest, most, swap
+
+    division_of = np.full(n, -1)
+    for d, division in enumerate(spec.division_indices):
+        division_of[division] = d
+    placed = (division_of[:, None] >= 0) & (division_of[None, :] >= 0)
+    same = placed & (division_of[:, None] == division_of[None, :])
+    fewest[placed] = 1
+    most[placed] = 2 if num_weeks >= 14 else 1
+    fewest[same], most[same], swap[same] = 2, 2, True
+    return fewest, most, swap
+
+
+def _violations(spec, opponents, home):
+    # opponents, home: (schedules, weeks, teams) stacks. Returns {rule: index arrays}, the first
+    # array always being the schedule index of each violation.
+    num_schedules, num_weeks, num_teams = opponents.shape
+    ks = np.arange(num_schedules)[:, None, None]
+    weeks = np.arange(num_weeks)[None, :, None]
+    teams = np.arange(num_teams)[None, None, :]
+    found = {}
+
+    # (1) Every team is paired with exactly one opponent and each game has one home team
+    in_range = (opponents >= 0) & (opponents < num_teams) & (opponents != teams)
+    opp = np.where(in_range, opponents, 0).astype(np.intp)
+    paired = in_range & (opponents[ks, weeks, opp] == teams)
+    game = paired & (home != home[ks, weeks, opp])
+    found['one_game_per_week'] = np.nonzero(~game)
+
+    # (2) Home games per team within the season's bounds
+    lo, hi = spec.home_game_bounds()
+    home_games = home.sum(axis=1)
+    found['home_away_balance'] = np.nonzero((home_games < lo) | (home_games > hi))
+
+    # (3) Every 3-week window has 1 or 2 home games
+    cumulative = np.concatenate([np.zeros((num_schedules, 1, num_teams), dtype=int), np.cumsum(home, axis=1)], axis=1)
+    windows = cumulative[:, 3:] - cumulative[:, :-3]
+    found['no_three_streak'] = np.nonzero((windows == 0) | (windows == 3))
+
+    # (4) No rematch within REMATCH_GAP - 1 weeks, reported once per pair (lower team index)
+    rematches = []
+    for gap in range(1, REMATCH_GAP):
+        close = paired[:, :-gap] & paired[:, gap:] & (opp[:, :-gap] == opp[:, gap:]) & (teams < opp[:, :-gap])
+        k, w, t = np.nonzero(close)
+        rematches.append((k, w, t, np.full(len(k), gap)))
+    found['rematch_gap'] = tuple(np.concatenate(column) for column in zip(*rematches))
+
+    # (5) Meetings per pair, and home-and-away when a pair must meet twice
+    index = (ks * num_teams + teams) * num_teams + opp
+    size = num_schedules * num_teams * num_teams
+    meetings = np.bincount(index[paired], minlength=size).reshape(num_schedules, num_teams, num_teams)
+    hosted = np.bincount(index[game & home], minlength=size).reshape(num_schedules, num_teams, num_teams)
+    fewest, most, swap = _pair_rules(spec)
+    upper = np.triu(np.ones((num_teams, num_teams), dtype=bool), 1)
+    wrong_count = (meetings < fewest) | (meetings > most)
+    one_sided = swap & (meetings == 2) & (hosted != 1)
+    found['round_robin'] = np.nonzero(upper & (wrong_count | one_sided))
+
+    # (6) Fixed matchups are played, at the requested venue
+    missed = []
+    for m, matchup in enumerate(spec.fixed_matchups):
+        w = matchup['week'] - 1
+        i, j = spec.team_indices[matchup['team1']], spec.team_indices[matchup['team2']]
+        played = opponents[:, w, i] == j
+        if matchup['direction'] == 'team1_away':
+            played &= home[:, w, j]
+        elif matchup['direction'] == 'team2_away':
+            played &= home[:, w, i]
+        k = np.flatnonzero(~played)
+        missed.append((k, np.full(len(k), m)))
+    found['fixed_matchups'] = tuple(np.concatenate(column) for column in zip(*missed)) if missed else (np.zeros(0, dtype=int),)
+    return found
+
+
+def validate_schedules(spec, opponents, home):
+    # Batch audit of (schedules, weeks, teams) opponent and home stacks: {rule: violations per
+    # schedule}, counting team-weeks, teams, windows or pairs depending on the rule
+    opponents = np.asarray(opponents)
+    home = np.asarray(home, dtype=bool)
+    return {rule: np.bincount(indices[0], minlength=opponents.shape[0])
+            for rule, indices in _violations(spec, opponents, home).items()}
+
+
+def _matrices(spec, schedule):
+    # A schedule dict (as returned by /generate), a Schedule, or (opponents, home) matrices
+    if isinstance(schedule, Schedule):
+        return schedule.matrices()
+    if isinstance(schedule, dict):
+        try:
+            return schedule_from_dict(schedule, spec.teams, spec.num_weeks)
+        except KeyError as e:
+            raise ValueError(f'Unknown team in schedule: {e.args[0]}') from None
+        except (TypeError, ValueError):
+            raise ValueError('Schedules map weeks to lists of [visitor, home] games') from None
+    return schedule
+
+
+def validate_schedule(spec, schedule):
+    # Every rule violation of one schedule, each {'rule', 'reason', ...details}
+    opponents, home = _matrices(spec, schedule)
+    found = _violations(spec, np.asarray(opponents)[None], np.asarray(home, dtype=bool)[None])
+    teams = spec.teams
+    lo, hi = spec.home_game_bounds()
+    violations = []
+
+    for _, w, t in zip(*found['one_game_per_week']):
+        o = opponents[w, t]
+        if 0 <= o < len(teams) and o != t and opponents[w, o] == t:
+            if t < o:
+                venue = 'home' if home[w, t] else 'away'
+                violations.append({'rule': 'one_game_per_week', 'week': int(w) + 1, 'teams': [teams[t], teams[o]],
+                                   'reason': f'{teams[t]} and {teams[o]} are both {venue} in week {w + 1}'})
+        else:
+            violations.append({'rule': 'one_game_per_week', 'week': int(w) + 1, 'teams': [teams[t]],
+                               'reason': f'{teams[t]} does not have exactly one opponent in week {w + 1}'})
+
+    home_games = home.sum(axis=0)
+    for _, t in zip(*found['home_away_balance']):
+        violations.append({'rule': 'home_away_balance', 'teams': [teams[t]], 'home_games': int(home_games[t]),
+                           'reason': f'{teams[t]} has {home_games[t]} home games (allowed {lo}-{hi})'})
+
+    for _, w, t in zip(*found['no_three_streak']):
+        venue = 'home' if home[w, t] else 'away'
+        violations.append({'rule': 'no_three_streak', 'teams': [teams[t]], 'weeks': [int(w) + 1, int(w) + 3],
+                           'reason': f'{teams[t]} plays {venue} in weeks {w + 1}-{w + 3}'})
+
+    for _, w, t, gap in zip(*found['rematch_gap']):
+        o = opponents[w, t]
+        violations.append({'rule': 'rematch_gap', 'teams': [teams[t], teams[o]], 'weeks': [int(w) + 1, int(w + gap) + 1],
+                           'reason': f'{teams[t]} and {teams[o]} meet in weeks {w + 1} and {w + gap + 1}'})
+
+    if found['round_robin'][0].size:
+        fewest, most, _ = _pair_rules(spec)
+        meetings = np.zeros((len(teams), len(teams)), dtype=int)
+        for w in range(opponents.shape[0]):
+            valid = opponents[w] >= 0
+            meetings[np.flatnonzero(valid), opponents[w][valid]] += 1
+        for _, i, j in zip(*found['round_robin']):
+            count = int(meetings[i, j])
+            if fewest[i, j] <= count <= most[i, j]:
+                reason = f'{teams[i]} and {teams[j]} meet twice without a home game each'
+            else:
+                allowed = f'{fewest[i, j]}' if fewest[i, j] == most[i, j] else f'{fewest[i, j]}-{most[i, j]}'
+                reason = f'{teams[i]} and {teams[j]} meet {count} time(s) (allowed {allowed})'
+            violations.append({'rule': 'round_robin', 'teams': [teams[i], teams[j]], 'meetings': count,
+                               'reason': reason})
+
+    for _, m in zip(*found['fixed_matchups']):
+        matchup = spec.fixed_matchups[m]
+        violations.append({'rule': 'fixed_matchups', 'fixed_matchup': matchup,
+                           'reason': f'Fixed matchup not played as requested: {describe(matchup)}'})
+
+    return {
+        'valid': not violations,
+        'violation_counts': {rule: sum(v['rule'] == rule for v in violations) for rule in VALIDATION_RULES},
+        'violations': violations,
+    }